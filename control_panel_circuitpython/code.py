@@ -99,7 +99,7 @@ class Cat_Squid_Screen_Saver:
         self.screen_saver_next_update = time.monotonic()
         self.cat_squid_positions = [(66,2), (72,2), (72,4), (66,4)]
         self.cat_squid_current_position = 0
-        self.cat_squid_bitmap = None
+        self.cat_squid_sprite = None
         self.parallax_far = [(12,4), (43,23), (75,15), (105,30), (130,4), (165,12)]
         self.parallax_far_x_current = 0
         self.parallax_far_x_delta = -4
@@ -108,7 +108,11 @@ class Cat_Squid_Screen_Saver:
         self.parallax_near_x_delta = -8
 
     def load(self):
-        self.cat_squid_bitmap, _ = adafruit_imageload.load(cat_squid_filename)
+        cat_squid_bitmap, _ = adafruit_imageload.load(cat_squid_filename)
+
+        # Convert once to LCD layout for fast drawing. Three-color bitmap where
+        # 0 == transparent, 1 == black, 2 == white
+        self.cat_squid_sprite = canon_mx340.K13988_Sprite.from_bitmap(cat_squid_bitmap, (None, 1, 0))
 
     async def loop(self):
         if time.monotonic() > self.screen_saver_next_update:
@@ -131,30 +135,15 @@ class Cat_Squid_Screen_Saver:
                 self.framebuffer.fill_rect(x+1,y-1,2,4,0)
             self.parallax_near_x_current = (self.parallax_near_x_current + 196 + self.parallax_near_x_delta)%196
 
-            for y in range(self.cat_squid_bitmap.height):
-                for x in range(self.cat_squid_bitmap.width):
-                    pixel = self.cat_squid_bitmap[x,y]
-
-                    # Just a quick hack for fun, so hard-coded for a three-color bitmap.
-                    # 0 == transparent
-                    # 1 == black
-                    # 2 == white
-                    if pixel == 0:
-                        pass
-                    elif pixel == 1:
-                        self.framebuffer.pixel(start_x+x, start_y+y, 1)
-                    elif pixel == 2:
-                        self.framebuffer.pixel(start_x+x, start_y+y, 0)
-                    else:
-                        print("Unexpected bitmap pixel color {0}".format(pixel))
+            self.framebuffer.blit_sprite(self.cat_squid_sprite, start_x, start_y)
 
             await self.k13988.refresh()
 
 async def printkeys(k13988):
-    """Poll for key events and show information to LCD screen"""
+    """Wait for key events and show information to LCD screen"""
     print("Starting printkeys()")
 
-    framebuffer = canon_mx340.K13988_FrameBuffer(k13988.get_frame_buffer_bytearray())
+    framebuffer = k13988.get_frame_buffer()
     screen_saver = Cat_Squid_Screen_Saver(k13988, framebuffer)
 
     # Clear screen to display "(None)"
@@ -166,20 +155,23 @@ async def printkeys(k13988):
     except:
         print("Unable to load {0}".format(cat_squid_filename))
 
-    # Enter key input response loop
-    last_active_time = time.time()
+    # Enter key input response loop. Sleeps until a key event arrives, or
+    # until it is time to draw the next screen saver frame.
+    key = canon_mx340.K13988_KeyEvent()
+    timeout = screen_saver_timeout
     while True:
-        key = k13988.get_key_event()
-        if key:
-            if key.pressed:
-                await write_keycode_string(k13988, framebuffer, key.key_number)
-            else:
-                await write_keycode_string(k13988, framebuffer, canon_mx340.Keycode.NONE)
-            last_active_time = time.time()
-        elif time.time() > (last_active_time + screen_saver_timeout):
+        try:
+            await asyncio.wait_for(k13988.next_key_event(key), timeout)
+        except asyncio.TimeoutError:
             await screen_saver.loop()
+            timeout = screen_saver.screen_saver_frame_period
+            continue
 
-        await asyncio.sleep(0)
+        if key.pressed:
+            await write_keycode_string(k13988, framebuffer, key.key_number)
+        else:
+            await write_keycode_string(k13988, framebuffer, canon_mx340.Keycode.NONE)
+        timeout = screen_saver_timeout
 
 async def direct_wired(k13988):
     """
@@ -208,7 +200,8 @@ async def direct_wired(k13988):
 async def main():
     """Test app entry point"""
     print("Starting main()")
-    async with canon_mx340.K13988(board.GP0, board.GP1, board.GP2) as k13988:
+    # Limit LCD updates to 20 frames per second, showing the latest frame
+    async with canon_mx340.K13988(board.GP0, board.GP1, board.GP2, max_frame_rate=20) as k13988:
         await asyncio.gather(
             inuse_blinker(k13988),
             wifi_blinker(k13988),
@@ -37,29 +37,87 @@ into the `\lib` subdirectory of CIRCUITPY volume.
 Includes several dependencies that will also need to be copied into `\lib`
 from CircuitPython library bundle.
 https://docs.circuitpython.org/projects/bundle/en/latest/
+
+Also runs on desktop Python (CPython) by passing `K13988` an already opened
+pyserial-style port instead of microcontroller pins. There the only
+dependency is adafruit_framebuf (`pip install adafruit-circuitpython-framebuf`).
 """
 
 # This library makes use of async/await model for asynchronous coroutines
 import asyncio
+import time
 
-# CircuitPython libraries for digital communication
-import digitalio
-import busio
+# CircuitPython libraries for digital communication. Not available on
+# desktop Python, where K13988 is given an existing serial port instead.
+try:
+    import digitalio
+    import busio
+except ImportError:
+    digitalio = None
+    busio = None
 
 # Parent class of optional LCD screen FrameBuffer wrapper
 import adafruit_framebuf
 
-# Support keyboard event queue
-from collections import deque
-from keypad import Event
+# Support glyph cache
+from collections import OrderedDict
+
+# Key event timestamps and statistics use the same millisecond clock as
+# keypad.Event, which wraps around after _TICKS_MAX. Its values stay small
+# integers, so reading it allocates nothing. Desktop Python has no supervisor
+# module, count from monotonic time instead.
+_TICKS_MAX = (1 << 29) - 1
+try:
+    from supervisor import ticks_ms as _ticks_ms
+except ImportError:
+    def _ticks_ms():
+        return (time.monotonic_ns() // 1000000) & _TICKS_MAX
 
-# Maximum number of UART transmission retries, raises RuntimeError when exceeded
+# Maximum number of UART transmission retries, raises RuntimeError when exceeded.
+# Initialization sequence, LED update, and LCD stripe each have their own limit.
 uart_tx_retry_limit = 16
+uart_tx_retry_limit_led = 16
+uart_tx_retry_limit_stripe = 16
+
+# Acknowledgement timeout (in seconds) is derived from measured round trip
+# time, doubling with each consecutive retry up to the maximum. Initial value
+# is used until first round trip is measured. Acknowledgements carry no
+# identity, so one that is merely late but taken as lost throws off matching of
+# later ones. Timeout therefore always allows the margin on top of round trip,
+# for time other tasks may hold the scheduler before the receiver gets to run.
+# A command sent while the receiver was backed off also allows for the
+# receiver's idle poll delay (`receive_idle_delay_limit`).
+uart_ack_timeout_initial = 0.02
+uart_ack_timeout_margin = 0.005
+uart_ack_timeout_max = 0.04
+
+# Maximum number of commands transmitted ahead of their acknowledgement
+uart_tx_window = 4
+
+# Size of buffer for data received from K13988. All data waiting in UART
+# (up to this size) is read and processed at once.
+receive_buffer_length = 32
+
+# When UART has no data and no acknowledgement is expected, receiver waits
+# before checking again. The wait grows by this step (in seconds) each time,
+# up to the limit, resetting on new data or when a command is sent.
+receive_idle_delay_step = 0.0005
+receive_idle_delay_limit = 0.002
+
+# Maximum number of pre-rendered text glyphs kept by each K13988_GlyphCache.
+# Least recently used glyph is discarded when full.
+glyph_cache_length = 64
 
-# Maximum length of keyboard event queue. Any additional events
-# are discarded when the queue is full.
+# Maximum length of keyboard event queue, allocated up front. Any additional
+# events are discarded when the queue is full.
 key_event_queue_length = 64
 
+# When driving several control panels with K13988_Scheduler: seconds to wait
+# for a panel to start up, and seconds between attempts to bring a panel back
+# after it stopped responding.
+panel_startup_timeout = 2.0
+panel_probe_interval = 1.0
+
 class Keycode:
     """
     Constants for all key scan codes.
@@ -133,6 +191,42 @@ keycode_string = dict({
     Keycode.COLOR:      "Color"
 })
 
+class K13988_KeyEvent:
+    """
+    A key press or release, with the same attributes as CircuitPython
+    `keypad.Event`. Unlike `keypad.Event`, may be reused by passing it to
+    `K13988.get_key_event_into()` or `K13988.next_key_event()` so reading
+    key events does not allocate memory.
+
+    :param key_number: Scan code of key, one of `Keycode` values
+    :param pressed: True if key was pressed, False if released
+    :param timestamp: Time of event in milliseconds, as `supervisor.ticks_ms()`
+    """
+    def __init__(self, key_number=0, pressed=True, timestamp=None):
+        self.key_number = key_number
+        self.pressed = pressed
+        self.timestamp = timestamp
+
+    @property
+    def released(self):
+        return not self.pressed
+
+    def __eq__(self, other):
+        if not isinstance(other, K13988_KeyEvent):
+            return NotImplemented
+        return self.key_number == other.key_number and self.pressed == other.pressed
+
+    def __hash__(self):
+        return self.key_number if self.pressed else -self.key_number
+
+    def __repr__(self):
+        return "<K13988_KeyEvent: key_number {0} {1}>".format(self.key_number, "pressed" if self.pressed else "released")
+
+# Whole LCD frame buffer (5 stripes of 196 bytes) of cleared or set pixels,
+# allocated once so fill() copies from them instead of building a new buffer
+_FRAME_CLEAR = bytes(196*5)
+_FRAME_SET = b'\xFF' * (196*5)
+
 class MVMSBFormat:
     """
     MVMSBFormat
@@ -140,11 +234,16 @@ class MVMSBFormat:
     Copied MVLSBFormat from
     https://github.com/adafruit/Adafruit_CircuitPython_framebuf/blob/main/adafruit_framebuf.py
     Then modified from least-significant bit nearest top of screen to most-significant-bit up top
+
+    Every drawing operation also records the stripes (8 pixel rows each) it
+    touched in `framebuf.dirty_stripes`, one bit per stripe, so only modified
+    stripes need to be sent to the LCD.
     """
 
     @staticmethod
     def set_pixel(framebuf, x, y, color):
         """Set a given pixel to a color."""
+        framebuf.dirty_stripes |= 1 << (y >> 3)
         index = (y >> 3) * framebuf.stride + x
         offset = y & 0x07
         pixel_byte = 0x00
@@ -162,41 +261,595 @@ class MVMSBFormat:
     @staticmethod
     def fill(framebuf, color):
         """completely fill/clear the buffer with a color"""
-        if color:
-            fill = 0xFF
+        framebuf.dirty_stripes = K13988_FrameBuffer.ALL_STRIPES
+        fill = _FRAME_SET if color else _FRAME_CLEAR
+        buf = framebuf.buf
+        if len(buf) == len(fill):
+            buf[:] = fill
         else:
-            fill = 0x00
-        for i in range(len(framebuf.buf)):  # pylint: disable=consider-using-enumerate
-            framebuf.buf[i] = fill
+            value = fill[0]
+            for index in range(len(buf)):
+                buf[index] = value
 
     @staticmethod
     def fill_rect(framebuf, x, y, width, height, color):
         """Draw a rectangle at the given location, size and color. The ``fill_rect`` method draws
         both the outline and interior."""
         # pylint: disable=too-many-arguments
-        while height > 0:
-            index = (y >> 3) * framebuf.stride + x
-            offset = y & 0x07
-            for w_w in range(width):
-                pixel_byte = 0x00
-                if color != 0:
-                    pixel_byte = 0x80 >> offset
-                framebuf.buf[index + w_w] = (
-                    framebuf.buf[index + w_w] & ~(0x80 >> offset)
-                ) | pixel_byte
-            y += 1
-            height -= 1
+        if height == 1:
+            MVMSBFormat.hline(framebuf, x, y, width, color)
+            return
+        if width == 1:
+            MVMSBFormat.vline(framebuf, x, y, height, color)
+            return
+
+        buf = framebuf.buf
+        y_end = y + height - 1
+        for stripe in range(y >> 3, (y_end >> 3) + 1):
+            framebuf.dirty_stripes |= 1 << stripe
+
+            # Combined bitmask of all rows of this rectangle within stripe
+            mask = 0xFF
+            if stripe == y >> 3:
+                mask &= 0xFF >> (y & 0x07)
+            if stripe == y_end >> 3:
+                mask &= (0xFF << (7 - (y_end & 0x07))) & 0xFF
+
+            index = stripe * framebuf.stride + x
+            if mask == 0xFF:
+                # Entire byte changes, no need to read existing value
+                if color:
+                    buf[index:index + width] = b'\xFF' * width
+                else:
+                    buf[index:index + width] = bytes(width)
+            elif color:
+                for i in range(index, index + width):
+                    buf[i] |= mask
+            else:
+                mask = ~mask & 0xFF
+                for i in range(index, index + width):
+                    buf[i] &= mask
+
+    @staticmethod
+    def hline(framebuf, x, y, width, color):
+        """Draw a horizontal line, one bit in each byte of a single stripe"""
+        framebuf.dirty_stripes |= 1 << (y >> 3)
+        buf = framebuf.buf
+        index = (y >> 3) * framebuf.stride + x
+        if color:
+            mask = 0x80 >> (y & 0x07)
+            for i in range(index, index + width):
+                buf[i] |= mask
+        else:
+            mask = ~(0x80 >> (y & 0x07)) & 0xFF
+            for i in range(index, index + width):
+                buf[i] &= mask
+
+    @staticmethod
+    def vline(framebuf, x, y, height, color):
+        """Draw a vertical line, one byte per stripe"""
+        buf = framebuf.buf
+        y_end = y + height - 1
+        for stripe in range(y >> 3, (y_end >> 3) + 1):
+            framebuf.dirty_stripes |= 1 << stripe
+
+            mask = 0xFF
+            if stripe == y >> 3:
+                mask &= 0xFF >> (y & 0x07)
+            if stripe == y_end >> 3:
+                mask &= (0xFF << (7 - (y_end & 0x07))) & 0xFF
+
+            index = stripe * framebuf.stride + x
+            if color:
+                buf[index] |= mask
+            else:
+                buf[index] &= ~mask & 0xFF
+
+    @staticmethod
+    def row_mask(stripe, y, y_end):
+        """Bitmask of rows from y up to (not including) y_end within a stripe"""
+        top = max(y - (stripe << 3), 0)
+        bottom = min(y_end - (stripe << 3), 8)
+        if top >= bottom:
+            return 0
+        return (0xFF >> top) & ~(0xFF >> bottom) & 0xFF
+
+    @staticmethod
+    def scroll_rect(framebuf, x, y, width, height, delta_x, delta_y, fill):
+        """
+        Shift pixels within a rectangle by delta_x and delta_y. Exposed area
+        is filled with `fill` color, or left as it is if `fill` is None.
+        Rectangle must be within frame buffer.
+        """
+        # pylint: disable=too-many-arguments,too-many-locals
+        buf = framebuf.buf
+        stride = framebuf.stride
+        x_end = x + width
+        y_end = y + height
+        first_stripe = y >> 3
+        last_stripe = (y_end - 1) >> 3
+        stripe_count = (framebuf.height + 7) >> 3
+        for stripe in range(first_stripe, last_stripe + 1):
+            framebuf.dirty_stripes |= 1 << stripe
+
+        # Columns and rows whose source is within the rectangle. Everything
+        # else within it is exposed.
+        column_start = max(x, x + delta_x)
+        column_end = min(x_end, x_end + delta_x)
+        row_start = max(y, y + delta_y)
+        row_end = min(y_end, y_end + delta_y)
+
+        if column_start >= column_end or row_start >= row_end:
+            # Shifted entirely out of the rectangle
+            pass
+        elif not delta_y:
+            # Every column is one byte per stripe, so a horizontal shift
+            # moves a slice of each stripe
+            for stripe in range(first_stripe, last_stripe + 1):
+                mask = MVMSBFormat.row_mask(stripe, y, y_end)
+                index = stripe * stride
+                start = index + column_start
+                end = index + column_end
+                if mask == 0xFF:
+                    buf[start:end] = buf[start - delta_x:end - delta_x]
+                else:
+                    source = buf[start - delta_x:end - delta_x]
+                    keep = ~mask & 0xFF
+                    for i in range(start, end):
+                        buf[i] = (buf[i] & keep) | (source[i - start] & mask)
+        else:
+            # Each destination byte takes its bits from the column delta_x to
+            # the left, in up to two source stripes: the one `whole` stripes
+            # up, shifted down `bits` rows, and the one above that, shifted up
+            # the rest of the way. Going against the direction of movement,
+            # both across stripes and across columns, reads every source byte
+            # before it is overwritten. Both shifts happen in this one pass,
+            # so exposed rows and columns keep what was there.
+            whole = delta_y >> 3
+            bits = delta_y & 0x07
+            if delta_y > 0:
+                stripes = range(last_stripe, first_stripe - 1, -1)
+            else:
+                stripes = range(first_stripe, last_stripe + 1)
+            if delta_x > 0:
+                columns = range(column_end - 1, column_start - 1, -1)
+            else:
+                columns = range(column_start, column_end)
+            for stripe in stripes:
+                mask = MVMSBFormat.row_mask(stripe, row_start, row_end)
+                if not mask:
+                    continue
+                index = stripe * stride
+                lower = stripe - whole
+                upper = lower - 1
+                lower_index = lower * stride - delta_x if 0 <= lower < stripe_count else None
+                upper_index = upper * stride - delta_x if bits and 0 <= upper < stripe_count else None
+
+                if not bits and mask == 0xFF:
+                    buf[index + column_start:index + column_end] = buf[lower_index + column_start:lower_index + column_end]
+                    continue
+                keep = ~mask & 0xFF
+                up_shift = 8 - bits
+                for column in columns:
+                    value = 0
+                    if lower_index is not None:
+                        value = buf[lower_index + column] >> bits
+                    if upper_index is not None:
+                        value |= buf[upper_index + column] << up_shift
+                    buf[index + column] = (buf[index + column] & keep) | (value & mask)
+
+        if fill is not None:
+            # Exposed columns over the full height, then exposed rows of the
+            # remaining columns
+            if delta_x > 0:
+                MVMSBFormat.fill_rect(framebuf, x, y, min(x_end, x + delta_x) - x, height, fill)
+            elif delta_x < 0:
+                exposed_start = max(x, x_end + delta_x)
+                MVMSBFormat.fill_rect(framebuf, exposed_start, y, x_end - exposed_start, height, fill)
+            if delta_y and column_start < column_end:
+                if delta_y > 0:
+                    exposed_start, exposed_end = y, min(y_end, y + delta_y)
+                else:
+                    exposed_start, exposed_end = max(y, y_end + delta_y), y_end
+                MVMSBFormat.fill_rect(framebuf, column_start, exposed_start,
+                    column_end - column_start, exposed_end - exposed_start, fill)
+
+    @staticmethod
+    def blit_sprite(framebuf, sprite, x, y):
+        """Draw opaque pixels of a `K13988_Sprite`, shifting whole bytes into place"""
+        buf = framebuf.buf
+        stride = framebuf.stride
+        x_start = max(x, 0)
+        x_end = min(x + sprite.width, framebuf.width)
+        if x_start >= x_end:
+            return
+
+        # Rows beyond frame buffer height are not drawn
+        last_stripe = framebuf.height >> 3
+        last_stripe_mask = (0xFF00 >> (framebuf.height & 0x07)) & 0xFF
+
+        shift = y & 0x07
+        for sprite_stripe in range(sprite.stripes):
+            source = sprite_stripe * sprite.width - x
+
+            # Each sprite stripe straddles up to two frame buffer stripes
+            for stripe, left_shift in ((y >> 3) + sprite_stripe, 0), ((y >> 3) + sprite_stripe + 1, 8):
+                if left_shift and not shift:
+                    break
+                if stripe < 0 or stripe > last_stripe:
+                    continue
+                if stripe == last_stripe:
+                    visible = last_stripe_mask
+                    if not visible:
+                        continue
+                else:
+                    visible = 0xFF
+                framebuf.dirty_stripes |= 1 << stripe
+
+                index = stripe * stride
+                for column in range(x_start, x_end):
+                    if left_shift:
+                        mask = (sprite.mask[source + column] << (left_shift - shift)) & visible
+                        pixels = sprite.pixels[source + column] << (left_shift - shift)
+                    else:
+                        mask = (sprite.mask[source + column] >> shift) & visible
+                        pixels = sprite.pixels[source + column] >> shift
+                    if mask:
+                        buf[index + column] = (buf[index + column] & ~mask) | (pixels & mask)
+
+class K13988_Sprite:
+    """
+    Image pre-converted to the LCD's layout of vertical MSB-first bytes in
+    8 pixel tall stripes, for drawing with `K13988_FrameBuffer.blit_sprite()`.
+
+    `pixels` holds pixel colors and `mask` has a bit set for every opaque pixel.
+
+    :param width: Width of sprite in pixels
+    :param height: Height of sprite in pixels
+    """
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.stripes = (height + 7) >> 3
+        self.pixels = bytearray(width * self.stripes)
+        self.mask = bytearray(width * self.stripes)
+
+    @staticmethod
+    def from_bitmap(bitmap, palette_colors=(None, 1, 0)):
+        """
+        Convert a `displayio.Bitmap` into a sprite.
+
+        :param bitmap: Source bitmap, for example from `adafruit_imageload`
+        :param palette_colors: Pixel color (1 or 0) for each palette index, or
+            None for transparent. Default treats index 0 as transparent,
+            1 as black and 2 as white.
+        """
+        sprite = K13988_Sprite(bitmap.width, bitmap.height)
+        for y in range(bitmap.height):
+            bit = 0x80 >> (y & 0x07)
+            index = (y >> 3) * sprite.width
+            for x in range(bitmap.width):
+                palette_index = bitmap[x, y]
+                if palette_index >= len(palette_colors):
+                    raise ValueError("Unexpected bitmap pixel color {0}".format(palette_index))
+                color = palette_colors[palette_index]
+                if color is not None:
+                    sprite.mask[index + x] |= bit
+                    if color:
+                        sprite.pixels[index + x] |= bit
+        return sprite
+
+class K13988_GlyphCache:
+    """
+    Text glyphs pre-rendered as `K13988_Sprite` for each size and color
+    requested, so drawing text is a matter of copying bytes. Holds up to
+    `glyph_cache_length` glyphs, discarding least recently used first.
+
+    :param font_name: Font file in the format used by adafruit_framebuf
+        (width byte, height byte, then one byte per column for 256 characters)
+    """
+    def __init__(self, font_name):
+        self.font_name = font_name
+        with open(font_name, "rb") as font_file:
+            self._font_data = font_file.read()
+        self.font_width = self._font_data[0]
+        self.font_height = self._font_data[1]
+        self._glyphs = OrderedDict()
+
+    def get(self, char, size, color):
+        """Returns `K13988_Sprite` for character, rendering it if not cached"""
+        key = (char, size, color)
+        glyph = self._glyphs.pop(key, None)
+        if glyph is None:
+            glyph = self._render(char, size, color)
+            if len(self._glyphs) >= glyph_cache_length:
+                del self._glyphs[next(iter(self._glyphs))]
+        # Move to most recently used position
+        self._glyphs[key] = glyph
+        return glyph
+
+    def _render(self, char, size, color):
+        """Render character scaled by size. Only set font bits are opaque."""
+        glyph = K13988_Sprite(self.font_width * size, self.font_height * size)
+        padding = glyph.stripes * 8 - glyph.height
+        scaled_bits = (1 << size) - 1
+        for char_x in range(self.font_width):
+            offset = 2 + (ord(char) * self.font_width) + char_x
+            if offset >= len(self._font_data):
+                # Character not in font, leave blank
+                continue
+            line = self._font_data[offset]
+
+            # Font column is least significant bit on top. Build scaled column
+            # with most significant bit on top, then split it into stripes.
+            column = 0
+            for char_y in range(self.font_height):
+                column <<= size
+                if (line >> char_y) & 0x1:
+                    column |= scaled_bits
+            column <<= padding
+
+            for stripe in range(glyph.stripes):
+                column_byte = (column >> (8 * (glyph.stripes - 1 - stripe))) & 0xFF
+                for scaled_x in range(char_x * size, (char_x + 1) * size):
+                    index = stripe * glyph.width + scaled_x
+                    glyph.mask[index] = column_byte
+                    if color:
+                        glyph.pixels[index] = column_byte
+        return glyph
 
 class K13988_FrameBuffer(adafruit_framebuf.FrameBuffer):
     """
     FrameBuffer class for drawing on the byte array
     """
+    # Bit flags with one bit set for each of the five stripes
+    ALL_STRIPES = 0b11111
+
     def __init__(self, buffer_bytearray):
         super().__init__(buffer_bytearray, 196, 34)
 
         # Change format over to our custom format.
         self.format = MVMSBFormat()
 
+        # Stripes modified since last transmission. Nothing has been sent yet,
+        # so every stripe starts out dirty.
+        self.dirty_stripes = self.ALL_STRIPES
+
+        # Pre-rendered glyphs for text(), created when first used
+        self._glyph_cache = None
+
+    def mark_dirty(self, stripes=ALL_STRIPES):
+        """
+        Flag stripes as modified. Needed after writing to the underlying
+        byte array directly instead of through FrameBuffer drawing methods.
+        """
+        self.dirty_stripes |= stripes
+
+    def hline(self, x, y, width, color):
+        """Draw a horizontal line up to a given length."""
+        if self.rotation == 0:
+            if y < 0 or y >= self.height:
+                return
+            x_end = min(self.width, x + width)
+            x = max(x, 0)
+            if x < x_end:
+                self.format.hline(self, x, y, x_end - x, color)
+        else:
+            super().hline(x, y, width, color)
+
+    def vline(self, x, y, height, color):
+        """Draw a vertical line up to a given length."""
+        if self.rotation == 0:
+            if x < 0 or x >= self.width:
+                return
+            y_end = min(self.height, y + height)
+            y = max(y, 0)
+            if y < y_end:
+                self.format.vline(self, x, y, y_end - y, color)
+        else:
+            super().vline(x, y, height, color)
+
+    def blit_sprite(self, sprite, x, y):
+        """
+        Draw a `K13988_Sprite` with its top left corner at (x, y), leaving
+        frame buffer untouched where the sprite is transparent.
+        Rotation is not supported.
+        """
+        if self.rotation != 0:
+            raise NotImplementedError("blit_sprite only supports rotation 0")
+        self.format.blit_sprite(self, sprite, x, y)
+
+    def scroll(self, delta_x, delta_y, fill=None):
+        """
+        Shift whole frame buffer by delta_x and delta_y pixels. Same as
+        adafruit_framebuf, but moves bytes instead of one pixel at a time.
+        Exposed area is filled with `fill` color if given. When rotated,
+        falls back to adafruit_framebuf, which has no `fill`.
+        """
+        if self.rotation == 0:
+            self.format.scroll_rect(self, 0, 0, self.width, self.height, delta_x, delta_y, fill)
+        elif fill is not None:
+            raise NotImplementedError("scroll fill only supports rotation 0")
+        else:
+            super().scroll(delta_x, delta_y)
+            self.mark_dirty()
+
+    def scroll_rect(self, x, y, width, height, delta_x, delta_y, fill=None):
+        """
+        Shift pixels within a rectangle by delta_x and delta_y, for example
+        to scroll a line of text. Pixels moved outside the rectangle are
+        discarded. Exposed area is filled with `fill` color if given, or
+        left as it is otherwise. Rotation is not supported.
+        """
+        # pylint: disable=too-many-arguments
+        if self.rotation != 0:
+            raise NotImplementedError("scroll_rect only supports rotation 0")
+        x_end = min(self.width, x + width)
+        y_end = min(self.height, y + height)
+        x = max(x, 0)
+        y = max(y, 0)
+        if x < x_end and y < y_end:
+            self.format.scroll_rect(self, x, y, x_end - x, y_end - y, delta_x, delta_y, fill)
+
+    def text(self, string, x, y, color, *, font_name="font5x8.bin", size=1):
+        """
+        Place text on the screen in variables sizes. Breaks on \n to next line.
+        Same output as adafruit_framebuf, but draws glyphs pre-rendered by
+        `K13988_GlyphCache` instead of one font pixel at a time.
+        """
+        if self.rotation != 0:
+            super().text(string, x, y, color, font_name=font_name, size=size)
+            return
+
+        size = max(size, 1)
+        color = 1 if color else 0
+        if self._glyph_cache is None or self._glyph_cache.font_name != font_name:
+            self._glyph_cache = K13988_GlyphCache(font_name)
+        width = self._glyph_cache.font_width
+        height = self._glyph_cache.font_height
+
+        for chunk in string.split("\n"):
+            for i, char in enumerate(chunk):
+                char_x = x + (i * (width + 1)) * size
+                if (
+                    char_x + (width * size) > 0
+                    and char_x < self.width
+                    and y + (height * size) > 0
+                    and y < self.height
+                ):
+                    self.format.blit_sprite(self, self._glyph_cache.get(char, size, color), char_x, y)
+            y += height * size
+
+    def take_dirty_stripes(self):
+        """Return bit flags of modified stripes and reset them to clean"""
+        stripes = self.dirty_stripes
+        self.dirty_stripes = 0
+        return stripes
+
+def _ticks_diff(end, start):
+    """Milliseconds from `start` to `end` as returned by `_ticks_ms()`, across wraparound"""
+    return (end - start) & _TICKS_MAX
+
+class K13988_Histogram:
+    """
+    Histogram of durations in milliseconds, with power of two buckets so
+    adding a sample costs only a few integer operations. `buckets[0]` counts
+    durations under 1ms, `buckets[n]` counts durations from 2**(n-1) up to
+    2**n milliseconds. The last bucket also counts anything longer.
+    """
+    BUCKET_COUNT = 24
+
+    def __init__(self):
+        self.buckets = [0] * self.BUCKET_COUNT
+        self.reset()
+
+    def reset(self):
+        """Discard all samples"""
+        for bucket in range(self.BUCKET_COUNT):
+            self.buckets[bucket] = 0
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def add(self, duration_ms):
+        """Add a sample"""
+        bucket = 0
+        while bucket < self.BUCKET_COUNT - 1 and duration_ms >> bucket:
+            bucket += 1
+        self.buckets[bucket] += 1
+        self.count += 1
+        self.total += duration_ms
+        if duration_ms > self.max:
+            self.max = duration_ms
+
+    def mean(self):
+        """Average of samples in milliseconds, 0 if none"""
+        if self.count == 0:
+            return 0
+        return self.total / self.count
+
+    def percentile(self, fraction):
+        """Upper bound in milliseconds of bucket holding given fraction (0.0-1.0) of samples"""
+        threshold = fraction * self.count
+        running = 0
+        for bucket in range(self.BUCKET_COUNT):
+            running += self.buckets[bucket]
+            if running >= threshold and running > 0:
+                return 1 << bucket
+        return 0
+
+    def __str__(self):
+        return "n={0} mean={1:.1f}ms p50<={2}ms p99<={3}ms max={4}ms".format(
+            self.count, self.mean(), self.percentile(0.5), self.percentile(0.99), self.max)
+
+class _RoundTripEstimator:
+    """
+    Smoothed round trip time and its variation, calculated as per TCP
+    retransmission timer (RFC 6298), to derive acknowledgement timeout.
+    Round trips are in milliseconds. As in BSD TCP, smoothed time is kept
+    times 8 and variation times 4 so updates stay in small integers.
+    """
+    def __init__(self):
+        self.smoothed = None
+        self.variation = 0
+
+    def add(self, round_trip):
+        """Update estimate with a newly measured round trip time"""
+        if self.smoothed is None:
+            self.smoothed = round_trip << 3
+            self.variation = round_trip << 1
+        else:
+            delta = round_trip - (self.smoothed >> 3)
+            self.smoothed += delta
+            # A difference of one millisecond is within resolution of the
+            # clock, not variation of the round trip. Decay rounds up so
+            # variation can settle all the way to zero.
+            self.variation += max(abs(delta) - 1, 0) - ((self.variation + 3) >> 2)
+
+    def timeout(self):
+        """Acknowledgement timeout in seconds before any retry backoff or margin"""
+        if self.smoothed is None:
+            return uart_ack_timeout_initial
+        # One more millisecond for resolution of measured round trips
+        return ((self.smoothed >> 3) + self.variation + 1) / 1000
+
+class K13988_Statistics:
+    """
+    Running counters and latency histograms of communication with K13988,
+    for spotting a degrading link before it fails outright.
+    Query via `K13988.get_statistics()`.
+    """
+    def __init__(self):
+        self.ack_round_trip = K13988_Histogram()   # Command sent to acknowledgement received
+        self.refresh_duration = K13988_Histogram() # Frame transmission including lock wait
+        self.lock_wait = K13988_Histogram()        # Time waiting for transmit lock
+        self.reset()
+
+    def reset(self):
+        """Zero all counters and histograms"""
+        self.commands_sent = 0       # Two byte commands, including retries
+        self.bulk_bytes_sent = 0     # Bulk transfer data bytes, including retries
+        self.retries = 0             # Acknowledgement timeouts
+        self.dropped_key_events = 0  # Key events discarded due to full queue
+        self.unknown_bytes = 0       # Received bytes neither ack nor known key scan code
+        self.ack_round_trip.reset()
+        self.refresh_duration.reset()
+        self.lock_wait.reset()
+
+    def __str__(self):
+        return "\n".join((
+            "Commands sent: {0}  Bulk bytes sent: {1}  Retries: {2}".format(
+                self.commands_sent, self.bulk_bytes_sent, self.retries),
+            "Dropped key events: {0}  Unknown bytes: {1}".format(
+                self.dropped_key_events, self.unknown_bytes),
+            "Ack round trip: {0}".format(self.ack_round_trip),
+            "Refresh duration: {0}".format(self.refresh_duration),
+            "Lock wait: {0}".format(self.lock_wait)))
+
+class _NoEnablePin:
+    """Placeholder when K13988 chip enable is not under our control"""
+    value = True
+
 class K13988:
     """
     Handles communication with K13988 chip in charge of the control panel.
@@ -205,88 +858,314 @@ class K13988:
     :param tx_pin: Microcontroller pin for UART data transmission to K13988
     :param rx_pin: Microcontroller pin to recieve UART data transmission from K13988
     :param enable_pin: Microcontroller pin for K13988 chip enable
+    :param double_buffered: When True, `refresh()` takes a snapshot of the frame
+        buffer and transmits it in the background so drawing can continue.
+    :param max_frame_rate: When set, `refresh()` only marks the frame as pending
+        and a background task transmits at most this many frames per second.
+        Frames refreshed in between are dropped in favor of the latest.
+        Transmission errors are raised by the next `refresh()` or
+        `wait_for_refresh()`.
+    :param uart: Use this already opened port instead of creating a UART on
+        `tx_pin` and `rx_pin`. Any object with `in_waiting`, `readinto()` and
+        `write()` will do, such as a pyserial `Serial` set to 250000 8E2.
+    :param enable: Use this object's `value` property instead of creating a
+        DigitalInOut on `enable_pin`. Optional when `uart` is given.
+    :param scheduler: `K13988_Scheduler` shared with other control panels.
+        Its receiver reads this panel's UART instead of a task of our own.
     """
-    def __init__(self, tx_pin: microcontroller.Pin, rx_pin: microcontroller.Pin, enable_pin: microcontroller.Pin):
+    def __init__(self, tx_pin: "microcontroller.Pin" = None, rx_pin: "microcontroller.Pin" = None,
+                 enable_pin: "microcontroller.Pin" = None, double_buffered: bool = False,
+                 max_frame_rate: float = None, uart=None, enable=None, scheduler=None):
         # Task synchronization
         self._transmit_lock = asyncio.Lock()
+        self._ack_available = asyncio.Event()
         self._transmit_startup = asyncio.Event()
         self._initialization_complete = asyncio.Event()
+        self._refresh_complete = asyncio.Event()
+        self._refresh_complete.set()
 
         # Hardware IO
-        self._enable = digitalio.DigitalInOut(enable_pin)
-        self._enable.switch_to_output(False)
-        self._uart = busio.UART(tx_pin, rx_pin, baudrate=250000, bits=8, parity=busio.UART.Parity.EVEN, stop=2, timeout=20)
+        if enable is not None:
+            self._enable = enable
+        elif enable_pin is not None:
+            self._enable = digitalio.DigitalInOut(enable_pin)
+            self._enable.switch_to_output(False)
+        elif uart is not None:
+            self._enable = _NoEnablePin()
+        else:
+            raise ValueError("K13988 requires enable_pin or enable")
+
+        if uart is not None:
+            self._uart = uart
+        else:
+            self._uart = busio.UART(tx_pin, rx_pin, baudrate=250000, bits=8, parity=busio.UART.Parity.EVEN, stop=2, timeout=20)
 
         # Raw frame buffer byte array
         self._framebuffer_bytearray = bytearray(196*5)
 
+        # Byte array transmitted to LCD. In double buffered mode this is a
+        # separate snapshot, otherwise it is the frame buffer itself.
+        self._double_buffered = double_buffered
+        if double_buffered:
+            self._transmit_bytearray = bytearray(196*5)
+        else:
+            self._transmit_bytearray = self._framebuffer_bytearray
+        self._refresh_task = None
+        self._refresh_error = None
+
+        # Refresh scheduler state
+        self._max_frame_rate = max_frame_rate
+        self._refresh_pending = asyncio.Event()
+        self._pending_full_refresh = False
+        self._refresh_scheduler_task = None
+
+        # FrameBuffer wrapper around the byte array, created on request
+        self._framebuffer = None
+
         # Internal state
         self._last_report = Keycode.NONE
         self._ack_count = 0
+        self._commands_in_flight = 0 # Sent commands awaiting acknowledgement
+        self._receiver_backed_off = False # Receiver sleeping before next check
         self._led_state = bytearray(b'\x0E\xFD')
-        self._key_event_queue = deque((), key_event_queue_length, True)
+        self._led_state_acknowledged = None # LED state byte last acknowledged by K13988
+        self._statistics = K13988_Statistics()
+
+        # Round trip estimates for two byte commands and 196 byte bulk
+        # transfers, kept separately as bulk data takes far longer on the wire.
+        self._command_round_trip = _RoundTripEstimator()
+        self._bulk_round_trip = _RoundTripEstimator()
+
+        # Key event queue is a ring buffer of preallocated arrays, one entry
+        # per event. Timestamps fit in a small int so storing them does not
+        # allocate memory either.
+        self._key_numbers = bytearray(key_event_queue_length)
+        self._key_pressed = bytearray(key_event_queue_length)
+        self._key_timestamps = [0] * key_event_queue_length
+        self._key_event_head = 0   # Index of oldest event in queue
+        self._key_event_count = 0  # Number of events in queue
+        self._key_event_available = asyncio.Event()
+
+        # Preallocated UART receive buffer, plus a view for each partial length
+        # so reading whatever is available does not allocate.
+        self._receive_buffer = bytearray(receive_buffer_length)
+        receive_view = memoryview(self._receive_buffer)
+        self._receive_views = [receive_view[0:length] for length in range(receive_buffer_length)]
+
+        self.receiver_task = None
+        self._scheduler = scheduler
+        if scheduler is not None:
+            scheduler.add(self)
+
+    def get_statistics(self):
+        """Returns `K13988_Statistics` of communication since startup or last reset"""
+        return self._statistics
+
+    def reset_statistics(self):
+        """Zero all counters and histograms of `get_statistics()`"""
+        self._statistics.reset()
 
     def get_frame_buffer_bytearray(self):
         """Returns reference to raw frame buffer `bytearray`"""
         return self._framebuffer_bytearray
 
+    def get_frame_buffer(self):
+        """
+        Returns `K13988_FrameBuffer` drawing on our frame buffer byte array.
+        Drawing through this object tracks modified stripes, allowing
+        `refresh()` to skip stripes that have not changed.
+        """
+        if self._framebuffer is None:
+            self._framebuffer = K13988_FrameBuffer(self._framebuffer_bytearray)
+        return self._framebuffer
+
     async def _uart_receiver(self):
         """UART data receiver listening coroutine"""
+        idle_delay = 0
+
         while True:
-            while self._uart.in_waiting < 1:
+            if self._receive() or self._commands_in_flight:
+                # Check again on the next scheduler pass, so acknowledgements
+                # are seen as soon as they arrive.
+                idle_delay = 0
                 await asyncio.sleep(0)
-            data = self._uart.read(1)[0]
+                continue
+            # Nothing to read or expected. Back off gradually so an idle link
+            # does not compete with other tasks for every scheduler tick.
+            self._receiver_backed_off = idle_delay > 0
+            await asyncio.sleep(idle_delay)
+            self._receiver_backed_off = False
+            idle_delay = min(idle_delay + receive_idle_delay_step, receive_idle_delay_limit)
+
+    def _receive(self):
+        """
+        Read and process everything waiting in UART, up to the size of
+        receive buffer. Never waits. Returns number of bytes received.
+        """
+        receive_buffer = self._receive_buffer
+        available = self._uart.in_waiting
+        if available < 1:
+            return 0
 
-            # First successful read complete, exit startup mode
-            self._transmit_startup.set()
+        # Drain everything available into preallocated buffer
+        if available < len(receive_buffer):
+            received = self._uart.readinto(self._receive_views[available])
+        else:
+            received = self._uart.readinto(receive_buffer)
+        if not received:
+            return 0
+
+        # First successful read complete, exit startup mode
+        self._transmit_startup.set()
 
+        # One timestamp is close enough for everything read at once
+        timestamp = _ticks_ms()
+
+        for index in range(received):
+            data = receive_buffer[index]
             if data == 0x20:
                 self._ack_count += 1
+                self._ack_available.set()
             elif data == 0x40:
                 # Ignore 0x40 as I have no idea what it means
-                pass
+                self._statistics.unknown_bytes += 1
             elif data != self._last_report:
-                if (len(self._key_event_queue) < key_event_queue_length):
-                    # Add event to queue reflecting change in key scan state
-                    if self._last_report != Keycode.NONE:
-                        self._key_event_queue.append(Event(self._last_report, False)) # Previous key released
-                    if data != Keycode.NONE:
-                        self._key_event_queue.append(Event(data, True)) # New key pressed
-                else:
-                    # No events are added if queue is full
-                    pass
+                if data not in keycode_string:
+                    self._statistics.unknown_bytes += 1
+                # Add events to queue reflecting change in key scan state
+                if self._last_report != Keycode.NONE:
+                    self._put_key_event(self._last_report, False, timestamp) # Previous key released
+                if data != Keycode.NONE:
+                    self._put_key_event(data, True, timestamp) # New key pressed
                 self._last_report = data
             else:
                 # Key matrix scan report unchanged, take no action
                 pass
+        return received
+
+    def _put_key_event(self, key_number, pressed, timestamp):
+        """Add event to key event queue and wake anyone waiting for it"""
+        if self._key_event_count >= key_event_queue_length:
+            # No events are added if queue is full
+            self._statistics.dropped_key_events += 1
+            return
+        index = (self._key_event_head + self._key_event_count) % key_event_queue_length
+        self._key_numbers[index] = key_number
+        self._key_pressed[index] = pressed
+        self._key_timestamps[index] = timestamp
+        self._key_event_count += 1
+        self._key_event_available.set()
 
     async def _wait_for_ack(self):
         """Hold execution until acknowledgement byte is received"""
         while self._ack_count < 1:
-            await asyncio.sleep(0)
+            self._ack_available.clear()
+            await self._ack_available.wait()
 
-    async def _uart_sender(self, bytes):
+    async def _uart_sender(self, bytes, retry_limit):
         """Send data to K13988"""
-        assert bytes is not None
-        assert len(bytes) == 2 or len(bytes) == 196
+        await self._uart_send_sequence((bytes,), retry_limit)
+
+    # Bytes crossing the wire in 12 milliseconds at 250000 baud 8E2 (12 bits)
+    _bytes_per_12ms = 250
 
+    @staticmethod
+    def _is_bulk_transfer(command):
+        """Returns True for bulk transfer header or data"""
+        return len(command) == 196 or command[0] == 0x06
+
+    async def _uart_send_sequence(self, commands, retry_limit):
+        """
+        Send a sequence of commands to K13988, keeping up to `uart_tx_window`
+        commands in flight ahead of their acknowledgement. Acknowledgements do
+        not identify a command, so they are matched to commands in the order
+        sent. On timeout, everything from the first unacknowledged command
+        onwards is sent again.
+
+        Bulk transfers (0x06 header and the 196 data bytes) never share the
+        window: they are only sent after everything before them has been
+        acknowledged, and nothing follows them until they have been acknowledged
+        in turn. Otherwise a lost acknowledgement for an earlier command could
+        cause the header to be sent again while K13988 is awaiting bulk data.
+
+        Timeout is derived from measured round trip time and doubles with each
+        consecutive retry. Raises RuntimeError after `retry_limit` retries.
+        """
+        statistics = self._statistics
+        count = len(commands)
+        next_unacked = 0
+        next_unsent = 0
         retry_count = 0
-        success = False
+        sent_time = [0] * min(count, uart_tx_window)
+        # Commands sent while receiver was backed off, whose acknowledgement
+        # may have sat unread for a while. Round trip not measured.
+        sent_backed_off = bytearray(min(count, uart_tx_window))
 
-        while not success:
-            sent = self._uart.write(bytes)
-            assert sent == 2 or len(bytes) == 196
+        # Round trips of retransmitted commands are ambiguous, as the
+        # acknowledgement may be for either transmission. Not measured.
+        retransmitted_until = 0
 
-            try:
-                await asyncio.wait_for(self._wait_for_ack(),0.02)
-                self._ack_count -= 1
-                success = True
-            except asyncio.TimeoutError:
-                if retry_count < uart_tx_retry_limit:
-                    print("Retrying 0x{0:X} 0x{1:X}".format(bytes[0],bytes[1]))
-                    retry_count += 1
+        try:
+            while next_unacked < count:
+                # Fill the transmit window
+                while next_unsent < count and next_unsent - next_unacked < uart_tx_window:
+                    command = commands[next_unsent]
+                    assert command is not None
+                    assert len(command) == 2 or len(command) == 196
+                    if next_unsent > next_unacked and (
+                        self._is_bulk_transfer(command) or self._is_bulk_transfer(commands[next_unsent-1])):
+                        break
+                    sent_time[next_unsent % uart_tx_window] = _ticks_ms()
+                    sent_backed_off[next_unsent % uart_tx_window] = self._receiver_backed_off
+                    sent = self._uart.write(command)
+                    assert sent == 2 or len(command) == 196
+                    if len(command) == 196:
+                        statistics.bulk_bytes_sent += 196
+                    else:
+                        statistics.commands_sent += 1
+                    next_unsent += 1
+
+                # Wait for acknowledgement of oldest command in flight
+                self._commands_in_flight = next_unsent - next_unacked
+                if len(commands[next_unacked]) == 196:
+                    estimator = self._bulk_round_trip
                 else:
-                    raise RuntimeError("No communication with K13988")
+                    estimator = self._command_round_trip
+                # Whole milliseconds for command and its ack to cross the wire
+                wire_time = (len(commands[next_unacked]) + 1) * 12 // self._bytes_per_12ms
+                timeout = max(estimator.timeout(), (wire_time + 1) / 1000) + uart_ack_timeout_margin
+                if sent_backed_off[next_unacked % uart_tx_window]:
+                    timeout += receive_idle_delay_limit
+                timeout = min(timeout * (1 << retry_count), uart_ack_timeout_max)
+                elapsed = _ticks_diff(_ticks_ms(), sent_time[next_unacked % uart_tx_window])
+                timeout = max(timeout - elapsed / 1000, uart_ack_timeout_margin)
+
+                try:
+                    await asyncio.wait_for(self._wait_for_ack(), timeout)
+                    self._ack_count -= 1
+                    round_trip = _ticks_diff(_ticks_ms(), sent_time[next_unacked % uart_tx_window])
+                    statistics.ack_round_trip.add(round_trip)
+                    # Acknowledgement faster than command and ack could cross the
+                    # wire is left over from an earlier command, not a valid sample.
+                    if (next_unacked >= retransmitted_until and round_trip >= wire_time and
+                        not sent_backed_off[next_unacked % uart_tx_window]):
+                        estimator.add(round_trip)
+                    next_unacked += 1
+                    retry_count = 0
+                except asyncio.TimeoutError:
+                    statistics.retries += 1
+                    if retry_count < retry_limit:
+                        command = commands[next_unacked]
+                        print("Retrying 0x{0:X} 0x{1:X}".format(command[0],command[1]))
+                        retry_count += 1
+                        # Go back and resend everything not yet acknowledged
+                        retransmitted_until = next_unsent
+                        next_unsent = next_unacked
+                    else:
+                        raise RuntimeError("No communication with K13988")
+        finally:
+            # Let receiver back off again
+            self._commands_in_flight = 0
 
     # Initialization sequence for NEC K13988 chip
     # Values came from logic analyzer watching behavior of a running MX340
@@ -321,18 +1200,152 @@ class K13988:
         # Wait for first byte from K13988 before transmitting initialization
         await self._transmit_startup.wait()
 
-        async with self._transmit_lock:
-            for init_command in self._k13988_init:
-                await self._uart_sender(init_command)
+        await self._acquire_transmit_lock()
+        try:
+            # K13988 may have been reset since an earlier initialization.
+            # Acknowledgements left over from then belong to no command, and
+            # initialization sequence changes LED state.
+            self._ack_count = 0
+            self._led_state_acknowledged = None
+            await self._uart_send_sequence(self._k13988_init, uart_tx_retry_limit)
+            await self._flush_led_state()
+        finally:
+            self._transmit_lock.release()
 
         # Set initialization complete event
         self._initialization_complete.set()
 
-    async def refresh(self):
-        """Following precedence of RGBMatrix, method to send frame buffer to screen"""
-        async with self._transmit_lock:
+    async def refresh(self, full_refresh=False):
+        """
+        Following precedence of RGBMatrix, method to send frame buffer to screen
+
+        Only stripes modified via `get_frame_buffer()` since the last refresh
+        are sent. Set `full_refresh` to send all stripes regardless, which is
+        also the behavior when drawing directly on the raw byte array.
+
+        In double buffered mode, waits for any previous refresh to complete,
+        then returns as soon as the frame buffer has been copied for
+        transmission in the background. Use `wait_for_refresh()` to wait for
+        transmission to complete.
+
+        With `max_frame_rate` set, returns immediately after marking the frame
+        pending. If double buffered, frame buffer is copied when the refresh
+        scheduler starts transmission. Otherwise each stripe is read from the
+        frame buffer as it is sent, so drawing done in the meantime may show
+        up part way through the frame. Any error from an earlier background
+        transmission is raised here, before the frame is marked pending.
+        """
+        if self._max_frame_rate:
+            self._raise_refresh_error()
+            self._pending_full_refresh = self._pending_full_refresh or full_refresh
+            self._refresh_complete.clear()
+            self._refresh_pending.set()
+            return
+
+        if self._double_buffered:
+            await self.wait_for_refresh()
+
+        stripes = self._take_refresh_stripes(full_refresh)
+
+        if self._double_buffered:
+            self._transmit_bytearray[:] = self._framebuffer_bytearray
+            self._refresh_complete.clear()
+            self._refresh_task = asyncio.create_task(self._background_refresh(stripes))
+        else:
+            await self._send_lcd_stripes(stripes)
+
+    def _take_refresh_stripes(self, full_refresh):
+        """Returns bit flags of stripes to send, resetting dirty stripe tracking"""
+        if full_refresh or self._framebuffer is None:
+            stripes = K13988_FrameBuffer.ALL_STRIPES
+            if self._framebuffer is not None:
+                self._framebuffer.take_dirty_stripes()
+        else:
+            stripes = self._framebuffer.take_dirty_stripes()
+        return stripes
+
+    async def _refresh_scheduler(self):
+        """Transmit pending frames, no more often than `max_frame_rate` per second"""
+        frame_period = 1 / self._max_frame_rate
+        next_frame_time = time.monotonic()
+        while True:
+            await self._refresh_pending.wait()
+            delay = next_frame_time - time.monotonic()
+            if delay > 0:
+                # Any refresh() calls during this delay merge into one frame
+                await asyncio.sleep(delay)
+            next_frame_time = time.monotonic() + frame_period
+
+            self._refresh_pending.clear()
+            stripes = self._take_refresh_stripes(self._pending_full_refresh)
+            self._pending_full_refresh = False
+            if self._double_buffered:
+                self._transmit_bytearray[:] = self._framebuffer_bytearray
+
+            try:
+                await self._send_lcd_stripes(stripes)
+            except Exception as error:
+                self._refresh_error = error
+
+            if not self._refresh_pending.is_set():
+                self._refresh_complete.set()
+
+    def _start_refresh_scheduler(self):
+        """Start background frame transmission if rate limited and not yet running"""
+        if self._max_frame_rate and self._refresh_scheduler_task is None:
+            self._refresh_scheduler_task = asyncio.create_task(self._refresh_scheduler())
+
+    async def wait_for_refresh(self):
+        """
+        Wait for background transmission started by `refresh()` in double
+        buffered or `max_frame_rate` mode to complete. Raises any error from
+        that transmission.
+        """
+        await self._refresh_complete.wait()
+        self._raise_refresh_error()
+
+    def _raise_refresh_error(self):
+        """Raise error kept from background transmission, if any, only once"""
+        if self._refresh_error is not None:
+            error = self._refresh_error
+            self._refresh_error = None
+            raise error
+
+    async def _background_refresh(self, stripes):
+        """Transmit frame snapshot, keeping any error for `wait_for_refresh()`"""
+        try:
+            await self._send_lcd_stripes(stripes)
+        except Exception as error:
+            self._refresh_error = error
+        finally:
+            self._refresh_complete.set()
+
+    async def _send_lcd_stripes(self, stripes):
+        """Send stripes flagged in `stripes` bit flags to LCD"""
+        start = _ticks_ms()
+        await self._acquire_transmit_lock()
+        try:
             for stripe in range(5):
-                await self._send_lcd_stripe(stripe)
+                if stripes & (1 << stripe):
+                    await self._send_lcd_stripe(stripe)
+                    # Let any LED update ride in between stripes
+                    await self._flush_led_state()
+            await self._flush_led_state()
+        except Exception:
+            # Stripes were no longer flagged as modified once taken for
+            # this refresh. Flag them again so the next refresh resends them.
+            if self._framebuffer is not None:
+                self._framebuffer.mark_dirty(stripes)
+            raise
+        finally:
+            self._transmit_lock.release()
+        self._statistics.refresh_duration.add(_ticks_diff(_ticks_ms(), start))
+
+    async def _acquire_transmit_lock(self):
+        """Acquire transmit lock, recording time spent waiting for it"""
+        start = _ticks_ms()
+        await self._transmit_lock.acquire()
+        self._statistics.lock_wait.add(_ticks_diff(_ticks_ms(), start))
 
     # Frame buffer is made of 5 stripes. During data transmission each stripe is
     # identified with the corresponding hexadecimal value
@@ -343,17 +1356,37 @@ class K13988:
         stripe_slice_start = stripe_num*196
         stripe_slice_end = stripe_slice_start+196
 
-        await self._uart_sender(self._stripe_id_lookup[stripe_num])
-        await self._uart_sender(b'\x04\xC8')
-        await self._uart_sender(b'\x04\x30')
-        await self._uart_sender(b'\x06\xC4') # Incoming bulk transmission of 196 (0xC4) bytes
-
-        await self._uart_sender(self._framebuffer_bytearray[stripe_slice_start:stripe_slice_end])
+        await self._uart_send_sequence((
+            self._stripe_id_lookup[stripe_num],
+            b'\x04\xC8',
+            b'\x04\x30',
+            b'\x06\xC4', # Incoming bulk transmission of 196 (0xC4) bytes
+            self._transmit_bytearray[stripe_slice_start:stripe_slice_end]),
+            uart_tx_retry_limit_stripe)
 
     async def _send_led_state(self):
-        """Transmit LED sate to K13988"""
-        async with self._transmit_lock:
-            await self._uart_sender(self._led_state)
+        """
+        Transmit LED state to K13988. If another transmission is in progress,
+        return immediately: every holder of transmit lock calls
+        `_flush_led_state()` before releasing it.
+        """
+        if self._transmit_lock.locked():
+            return
+        await self._acquire_transmit_lock()
+        try:
+            await self._flush_led_state()
+        finally:
+            self._transmit_lock.release()
+
+    async def _flush_led_state(self):
+        """
+        Transmit LED state unless it matches what K13988 last acknowledged.
+        Caller must hold transmit lock.
+        """
+        while self._led_state[1] != self._led_state_acknowledged:
+            led_state = bytes(self._led_state)
+            await self._uart_sender(led_state, uart_tx_retry_limit_led)
+            self._led_state_acknowledged = led_state[1]
 
     async def in_use_led(self, newState):
         """Update bit flag corresponding to In Use/Memory LED based on parameter"""
@@ -373,10 +1406,47 @@ class K13988:
 
     def get_key_event(self):
         """Get a key event. If no event, returns None"""
-        if len(self._key_event_queue) == 0:
-            return None
+        event = K13988_KeyEvent()
+        if self.get_key_event_into(event):
+            return event
         else:
-            return self._key_event_queue.popleft()
+            return None
+
+    def get_key_event_into(self, event):
+        """
+        Fill in an existing `K13988_KeyEvent` with the oldest key event,
+        without allocating memory. Returns True if there was an event,
+        False (leaving `event` untouched) if not.
+        """
+        if self._key_event_count == 0:
+            return False
+        index = self._key_event_head
+        event.key_number = self._key_numbers[index]
+        event.pressed = bool(self._key_pressed[index])
+        event.timestamp = self._key_timestamps[index]
+        self._key_event_head = (index + 1) % key_event_queue_length
+        self._key_event_count -= 1
+        return True
+
+    async def next_key_event(self, event=None):
+        """
+        Wait for a key event and return it. Waiting costs nothing until the
+        UART receiver adds an event to the queue. If `event` is given, it is
+        filled in and returned instead of allocating a new `K13988_KeyEvent`.
+        """
+        if event is None:
+            event = K13988_KeyEvent()
+        while not self.get_key_event_into(event):
+            self._key_event_available.clear()
+            await self._key_event_available.wait()
+        return event
+
+    def __aiter__(self):
+        """Key events as an asynchronous iterator: `async for event in k13988`"""
+        return self
+
+    async def __anext__(self):
+        return await self.next_key_event()
 
     async def __aenter__(self):
         """Asynchronous context manager entry to set up K13988 communications"""
@@ -385,16 +1455,176 @@ class K13988:
         await asyncio.sleep(0.25)
         self._enable.value = True
 
-        # Start listener for K13988 data
-        self.receiver_task = asyncio.create_task(self._uart_receiver())
+        # Start listener for K13988 data, unless a shared scheduler reads it
+        if self._scheduler is not None:
+            self._scheduler.start_receiver()
+        else:
+            self.receiver_task = asyncio.create_task(self._uart_receiver())
 
         # Send initialization sequence
         await self._initialize_k13988()
 
+        self._start_refresh_scheduler()
+
         # We are all set up and ready for application code
         return self
 
     async def __aexit__(self, exc_type, exc, tb):
         """Asynchronous context manager exit to clean up K13988 communications"""
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+        if self._refresh_scheduler_task is not None:
+            self._refresh_scheduler_task.cancel()
         self._enable.value = False
-        self.receiver_task.cancel()
+        if self.receiver_task is not None:
+            self.receiver_task.cancel()
+
+class K13988_Scheduler:
+    """
+    Drives several control panels, each on its own UART, from one event loop.
+    Pass the scheduler to every `K13988` and enter it instead of each panel:
+
+        scheduler = K13988_Scheduler()
+        panels = [K13988(uart=uart, enable=enable, scheduler=scheduler) for uart, enable in ...]
+        async with scheduler:
+            await scheduler.refresh()
+
+    A single receiver task reads every panel's UART in turn, starting with a
+    different panel each pass so none is always served first. Panels wait
+    for their acknowledgements without polling, so their transmissions
+    interleave freely and each UART is kept busy.
+
+    A panel that fails to start or stops responding is marked dead and left
+    out of `refresh()`, so its retries and timeouts do not hold up the
+    others. Every `panel_probe_interval` seconds a background task sends it
+    the initialization sequence and a full frame, and it rejoins once that
+    succeeds.
+    """
+    def __init__(self):
+        self.panels = []
+        self._dead = []           # True for each panel not responding
+        self._failures = []       # Times each panel was marked dead
+        self._probe_tasks = []    # Background recovery task of each dead panel
+        self._receiver_task = None
+
+    def add(self, panel):
+        """Add a `K13988`. Done by `K13988` when given `scheduler`."""
+        self.panels.append(panel)
+        self._dead.append(False)
+        self._failures.append(0)
+        self._probe_tasks.append(None)
+
+    def start_receiver(self):
+        """Start shared receiver task, if not already running"""
+        if self._receiver_task is None:
+            self._receiver_task = asyncio.create_task(self._uart_receiver())
+
+    async def _uart_receiver(self):
+        """Read all panels' UARTs round robin, backing off when all are idle"""
+        idle_delay = 0
+        first = 0
+        while True:
+            count = len(self.panels)
+            received = 0
+            for offset in range(count):
+                received += self.panels[(first + offset) % count]._receive()
+            first = (first + 1) % count if count else 0
+
+            if received or any(panel._commands_in_flight for panel in self.panels):
+                # Let panels woken by acknowledgements transmit, and check
+                # again on the next pass while acknowledgements are expected
+                idle_delay = 0
+                await asyncio.sleep(0)
+            else:
+                for panel in self.panels:
+                    panel._receiver_backed_off = idle_delay > 0
+                await asyncio.sleep(idle_delay)
+                for panel in self.panels:
+                    panel._receiver_backed_off = False
+                idle_delay = min(idle_delay + receive_idle_delay_step, receive_idle_delay_limit)
+
+    def is_dead(self, index):
+        """True if panel number `index` is not responding"""
+        return self._dead[index]
+
+    def _mark_dead(self, index):
+        if self._dead[index]:
+            return
+        self._dead[index] = True
+        self._failures[index] += 1
+        self._probe_tasks[index] = asyncio.create_task(self._probe(index))
+
+    async def _probe(self, index):
+        """Try to bring back a dead panel until it responds"""
+        panel = self.panels[index]
+        while True:
+            await asyncio.sleep(panel_probe_interval)
+            try:
+                # Panel may have been reset since, start over from initialization
+                await asyncio.wait_for(panel._initialize_k13988(), panel_startup_timeout)
+                panel._start_refresh_scheduler()
+                await panel.refresh(full_refresh=True)
+                await panel.wait_for_refresh()
+            except (RuntimeError, asyncio.TimeoutError):
+                continue
+            self._dead[index] = False
+            self._probe_tasks[index] = None
+            return
+
+    async def _enter_panel(self, index):
+        try:
+            await asyncio.wait_for(self.panels[index].__aenter__(), panel_startup_timeout)
+        except (RuntimeError, asyncio.TimeoutError):
+            self._mark_dead(index)
+
+    async def _refresh_panel(self, index, full_refresh):
+        panel = self.panels[index]
+        try:
+            await panel.refresh(full_refresh)
+            await panel.wait_for_refresh()
+        except RuntimeError:
+            self._mark_dead(index)
+
+    async def refresh(self, full_refresh=False):
+        """
+        Refresh every responding panel at once, returning when all have
+        finished. See `K13988.refresh()`. Panels that stop responding are
+        marked dead instead of raising an error.
+        """
+        await asyncio.gather(*(self._refresh_panel(index, full_refresh)
+            for index in range(len(self.panels)) if not self._dead[index]))
+
+    def get_statistics(self):
+        """Returns list of `K13988_Statistics`, one per panel"""
+        return [panel.get_statistics() for panel in self.panels]
+
+    def __str__(self):
+        lines = []
+        for index, panel in enumerate(self.panels):
+            statistics = panel.get_statistics()
+            lines.append("Panel {0}: {1}  Failures: {2}  Retries: {3}".format(
+                index, "dead" if self._dead[index] else "ok", self._failures[index], statistics.retries))
+            lines.append("  Refresh duration: {0}".format(statistics.refresh_duration))
+            lines.append("  Ack round trip: {0}".format(statistics.ack_round_trip))
+        return "\n".join(lines)
+
+    async def __aenter__(self):
+        """Start shared receiver and set up all panels at once"""
+        self.start_receiver()
+        await asyncio.gather(*(self._enter_panel(index) for index in range(len(self.panels))))
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        """Clean up all panels and stop shared receiver"""
+        probes = [task for task in self._probe_tasks if task is not None]
+        for task in probes:
+            task.cancel()
+        # Let cancelled probes finish unwinding, so none is left pending
+        await asyncio.gather(*probes, return_exceptions=True)
+        for index in range(len(self._probe_tasks)):
+            self._probe_tasks[index] = None
+        for panel in self.panels:
+            await panel.__aexit__(exc_type, exc, tb)
+        if self._receiver_task is not None:
+            self._receiver_task.cancel()
+            self._receiver_task = None
@@ -0,0 +1,428 @@
+"""
+Benchmark canon_mx340 K13988 driver against a simulated control panel.
+
+Runs the driver against `K13988Simulator` over a modeled serial link: every
+byte occupies the wire for 12 bit times (start, 8 data, even parity, 2 stop)
+at 250000 baud, in each direction independently. Everything runs on a
+virtual clock, so results reflect the modeled link and not the speed or
+timer resolution of the desktop computer. Each pass of the asyncio scheduler
+is charged a fixed CPU cost (--tick-us) so polling loops take time as they
+would on a microcontroller.
+
+Reports, in seconds of modeled time unless noted:
+* init: From chip enable to initialization sequence complete
+* full_refresh: Latency to send all five stripes
+* partial_refresh: Latency to send one modified stripe
+* sustained_fps: Frames per second sending full frames back to back
+* wire_bytes_per_frame: Bytes sent to the control panel for one full frame
+* ack_loss_N: Full refresh latency and retries with N percent of acks lost
+* slow_ack: Full refreshes 50ms apart with K13988 taking --slow-ack-ms to
+  acknowledge, while another task holds the CPU for 3ms every 10ms:
+  latency, retries, and frames the panel got wrong
+* panels_N: N control panels on one K13988_Scheduler, each on its own
+  modeled link, refreshed together: aggregate frames per second of all
+  panels and per-panel refresh latency
+* dead_panel: Same as the largest panels_N, with one panel dropping every
+  acknowledgement, showing whether the others keep their frame rate
+
+Results are written as JSON. Compare against an earlier run with --compare
+to flag regressions.
+
+Requires adafruit_framebuf: pip install adafruit-circuitpython-framebuf
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import selectors
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "control_panel_circuitpython", "lib"))
+import canon_mx340
+
+from k13988_simulator import K13988Simulator
+
+# Version of JSON result format
+RESULT_FORMAT = 2
+
+BAUD_RATE = 250000
+BITS_PER_BYTE = 12 # 8E2: start + 8 data + parity + 2 stop
+
+# Last component of result keys where a higher value is better. Everything
+# else (times, retries, failures, bad frames) is better lower.
+HIGHER_IS_BETTER = {"sustained_fps", "aggregate_fps", "healthy_panels", "count"}
+
+class VirtualClockSelector(selectors.SelectSelector):
+    """
+    Selector that never actually waits. Instead of sleeping until the next
+    timer, it advances a virtual clock to that time. Every call also costs
+    `tick` seconds, representing CPU time of one scheduler pass.
+    """
+    def __init__(self, tick):
+        super().__init__()
+        self.clock = 0.0
+        self.tick = tick
+
+    def select(self, timeout=None):
+        if timeout is None:
+            raise RuntimeError("Simulation deadlock: no timers and nothing to run")
+        self.clock += max(timeout, self.tick)
+        return super().select(0)
+
+class VirtualClockEventLoop(asyncio.SelectorEventLoop):
+    """Event loop whose time() is the virtual clock of VirtualClockSelector"""
+    def __init__(self, tick):
+        self._virtual_selector = VirtualClockSelector(tick)
+        super().__init__(self._virtual_selector)
+
+    def time(self):
+        return self._virtual_selector.clock
+
+class TimedSerialPort:
+    """
+    Driver end of a modeled serial link to `TimedK13988Simulator`. Bytes
+    written are delivered to the simulator one at a time as each finishes
+    crossing the wire.
+    """
+    def __init__(self, simulator, byte_time):
+        self._simulator = simulator
+        self._byte_time = byte_time
+        self._received = bytearray()
+        self._wire_free = 0.0
+        self.bytes_written = 0
+
+    @property
+    def in_waiting(self):
+        return len(self._received)
+
+    def read(self, size=1):
+        data = bytes(self._received[:size])
+        del self._received[:size]
+        return data
+
+    def readinto(self, buffer):
+        count = min(len(buffer), len(self._received))
+        buffer[:count] = self._received[:count]
+        del self._received[:count]
+        return count
+
+    def write(self, data):
+        loop = asyncio.get_running_loop()
+        arrival = max(self._wire_free, loop.time())
+        for data_byte in bytes(data):
+            arrival += self._byte_time
+            loop.call_at(arrival, self._simulator._receive_byte, data_byte)
+        self._wire_free = arrival
+        self.bytes_written += len(data)
+        return len(data)
+
+    def _deliver(self, data_byte):
+        self._received.append(data_byte)
+
+    def close(self):
+        pass
+
+class TimedK13988Simulator(K13988Simulator):
+    """K13988Simulator on a modeled serial link instead of a pseudo-terminal"""
+    def __init__(self, *args, baud_rate=BAUD_RATE, **kwargs):
+        self.byte_time = BITS_PER_BYTE / baud_rate
+        self._wire_free = 0.0
+        super().__init__(*args, **kwargs)
+
+    def _open_port(self):
+        return TimedSerialPort(self, self.byte_time)
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+
+    def stop(self):
+        if self._key_script_task is not None:
+            self._key_script_task.cancel()
+
+    def send(self, data):
+        """Send bytes to driver, each arriving after its time on the wire"""
+        arrival = max(self._wire_free, self._loop.time())
+        for data_byte in bytes(data):
+            arrival += self.byte_time
+            self._loop.call_at(arrival, self.port._deliver, data_byte)
+        self._wire_free = arrival
+
+class Benchmark:
+    """Run all measurements on one simulated control panel"""
+    def __init__(self, frames, tick, ack_delay, slow_ack_delay=0.0025):
+        self.frames = frames
+        self.tick = tick
+        self.ack_delay = ack_delay
+        self.slow_ack_delay = slow_ack_delay
+
+    def run(self, ack_loss_rates, panel_counts=()):
+        results = dict()
+        loop = VirtualClockEventLoop(self.tick)
+        # Driver statistics must also be timed on the virtual clock
+        canon_mx340._ticks_ms = lambda: int(loop.time() * 1000) & canon_mx340._TICKS_MAX
+        try:
+            results.update(loop.run_until_complete(self._measure_link()))
+            for rate in ack_loss_rates:
+                results.update(loop.run_until_complete(self._measure_ack_loss(rate)))
+            results.update(loop.run_until_complete(self._measure_slow_ack()))
+            for count in panel_counts:
+                results.update(loop.run_until_complete(self._measure_panels(count)))
+            if panel_counts and max(panel_counts) > 1:
+                results.update(loop.run_until_complete(self._measure_panels(max(panel_counts), dead=1)))
+        finally:
+            loop.close()
+        return results
+
+    async def _open(self, ack_drop_rate=0.0):
+        simulator = TimedK13988Simulator(ack_drop_rate=ack_drop_rate, ack_delay=self.ack_delay, seed=340)
+        simulator.start()
+        return simulator
+
+    async def _timed(self, coroutine):
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        await coroutine
+        return loop.time() - start
+
+    async def _measure_link(self):
+        loop = asyncio.get_running_loop()
+        simulator = await self._open()
+        results = dict()
+        with contextlib.redirect_stdout(io.StringIO()):
+            async with canon_mx340.K13988(uart=simulator.port, enable=simulator) as k13988:
+                # Chip enable happened 0.25 seconds into __aenter__
+                results["init"] = loop.time() - simulator.enabled_time
+                framebuffer = k13988.get_frame_buffer()
+
+                full = []
+                for frame in range(self.frames):
+                    framebuffer.fill(frame & 1)
+                    before = simulator.port.bytes_written
+                    full.append(await self._timed(k13988.refresh(full_refresh=True)))
+                wire_bytes = simulator.port.bytes_written - before
+                results["full_refresh"] = summarize(full)
+                results["wire_bytes_per_frame"] = wire_bytes
+
+                partial = []
+                for frame in range(self.frames):
+                    framebuffer.fill_rect(frame % 190, 10, 4, 4, frame & 1)
+                    partial.append(await self._timed(k13988.refresh()))
+                results["partial_refresh"] = summarize(partial)
+
+                start = loop.time()
+                for frame in range(self.frames):
+                    framebuffer.fill(frame & 1)
+                    await k13988.refresh()
+                results["sustained_fps"] = self.frames / (loop.time() - start)
+
+                statistics = k13988.get_statistics()
+                results["link_retries"] = statistics.retries
+                results["ack_round_trip_ms"] = dict(
+                    mean=statistics.ack_round_trip.mean(),
+                    max=statistics.ack_round_trip.max)
+        simulator.stop()
+        return results
+
+    async def _measure_ack_loss(self, rate):
+        simulator = await self._open(ack_drop_rate=rate)
+        name = "ack_loss_{0:g}".format(rate * 100)
+        latencies = []
+        failures = 0
+        with contextlib.redirect_stdout(io.StringIO()):
+            async with canon_mx340.K13988(uart=simulator.port, enable=simulator) as k13988:
+                framebuffer = k13988.get_frame_buffer()
+                for frame in range(self.frames):
+                    framebuffer.fill(frame & 1)
+                    try:
+                        latencies.append(await self._timed(k13988.refresh(full_refresh=True)))
+                    except RuntimeError:
+                        failures += 1
+                retries = k13988.get_statistics().retries
+        simulator.stop()
+        return {name: dict(summarize(latencies),
+                           retries=retries,
+                           acks_dropped=simulator.acks_dropped,
+                           failures=failures)}
+
+    async def _busy_task(self, period, duration):
+        """Hold the CPU for `duration` every `period` seconds, as drawing would"""
+        selector = asyncio.get_running_loop()._virtual_selector
+        while True:
+            await asyncio.sleep(period)
+            selector.clock += duration
+
+    async def _measure_slow_ack(self):
+        simulator = TimedK13988Simulator(ack_delay=self.slow_ack_delay, seed=340)
+        simulator.start()
+        busy = asyncio.get_running_loop().create_task(self._busy_task(0.01, 0.003))
+        latencies = []
+        bad_frames = 0
+        with contextlib.redirect_stdout(io.StringIO()):
+            async with canon_mx340.K13988(uart=simulator.port, enable=simulator) as k13988:
+                k13988.reset_statistics()
+                framebuffer = k13988.get_frame_buffer()
+                for frame in range(self.frames):
+                    # Idle in between, as an application drawing now and then
+                    await asyncio.sleep(0.05)
+                    framebuffer.fill(0)
+                    framebuffer.fill_rect(frame % 190, 0, 6, 34, 1)
+                    latencies.append(await self._timed(k13988.refresh(full_refresh=True)))
+                    if simulator.frame != k13988.get_frame_buffer_bytearray():
+                        bad_frames += 1
+                retries = k13988.get_statistics().retries
+        busy.cancel()
+        simulator.stop()
+        return dict(slow_ack=dict(summarize(latencies), retries=retries, bad_frames=bad_frames))
+
+    async def _measure_panels(self, count, dead=0):
+        loop = asyncio.get_running_loop()
+        simulators = []
+        for index in range(count):
+            # Dead panels are the last ones, and acknowledge nothing
+            simulator = TimedK13988Simulator(ack_drop_rate=1.0 if index >= count - dead else 0.0,
+                ack_delay=self.ack_delay, seed=340 + index)
+            simulator.start()
+            simulators.append(simulator)
+        name = "dead_panel" if dead else "panels_{0}".format(count)
+
+        scheduler = canon_mx340.K13988_Scheduler()
+        panels = [canon_mx340.K13988(uart=simulator.port, enable=simulator, scheduler=scheduler)
+            for simulator in simulators]
+        with contextlib.redirect_stdout(io.StringIO()):
+            async with scheduler:
+                for panel in panels:
+                    panel.reset_statistics()
+                framebuffers = [panel.get_frame_buffer() for panel in panels]
+                start = loop.time()
+                for frame in range(self.frames):
+                    for framebuffer in framebuffers:
+                        framebuffer.fill(frame & 1)
+                    await scheduler.refresh()
+                elapsed = loop.time() - start
+                healthy = [panel.get_statistics() for index, panel in enumerate(panels)
+                    if not scheduler.is_dead(index)]
+        for simulator in simulators:
+            simulator.stop()
+
+        refresh_means = [statistics.refresh_duration.mean() / 1000 for statistics in healthy]
+        return {name: dict(
+            aggregate_fps=sum(statistics.refresh_duration.count for statistics in healthy) / elapsed,
+            healthy_panels=len(healthy),
+            refresh_mean=sum(refresh_means) / len(refresh_means) if refresh_means else 0,
+            refresh_max=max(statistics.refresh_duration.max for statistics in healthy) / 1000 if healthy else 0)}
+
+def summarize(samples):
+    """Reduce list of latencies to summary statistics"""
+    if not samples:
+        return dict(count=0)
+    ordered = sorted(samples)
+    return dict(
+        count=len(ordered),
+        mean=sum(ordered) / len(ordered),
+        min=ordered[0],
+        median=ordered[len(ordered) // 2],
+        p95=ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+        max=ordered[-1])
+
+def flatten(results, prefix=""):
+    """Flatten nested result dictionaries into {"a.b": value}"""
+    flat = dict()
+    for key, value in results.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, prefix + key + "."))
+        else:
+            flat[prefix + key] = value
+    return flat
+
+def format_value(value):
+    """Format number for comparison table, "-" if absent"""
+    if value is None:
+        return "-"
+    return "{0:.6g}".format(value)
+
+def compare(baseline, current, threshold):
+    """
+    Print side-by-side comparison. Returns number of regressions, where a
+    regression is a change worse than `threshold` (fraction) in the wrong
+    direction, or any increase from zero of a metric where lower is better.
+    Keys in HIGHER_IS_BETTER are better higher, everything else lower.
+    """
+    for key in sorted(set(baseline["config"]) | set(current["config"])):
+        if baseline["config"].get(key) != current["config"].get(key):
+            print("Note: {0} differs, baseline {1} current {2}".format(
+                key, baseline["config"].get(key), current["config"].get(key)))
+    old = flatten(baseline["results"])
+    new = flatten(current["results"])
+    regressions = 0
+    print("{0:<32}{1:>14}{2:>14}{3:>10}".format("metric", "baseline", "current", "change"))
+    for key in sorted(set(old) | set(new)):
+        if key not in old or key not in new:
+            print("{0:<32}{1:>14}{2:>14}".format(key, format_value(old.get(key)), format_value(new.get(key))))
+            continue
+        change = ""
+        flag = ""
+        if old[key]:
+            ratio = (new[key] - old[key]) / abs(old[key])
+            change = "{0:+.1%}".format(ratio)
+        elif new[key]:
+            # Any change from zero is beyond every threshold
+            ratio = float("inf") if new[key] > 0 else float("-inf")
+            change = "from 0"
+        else:
+            ratio = 0.0
+        higher_is_better = key.rpartition(".")[2] in HIGHER_IS_BETTER
+        if (ratio < -threshold) if higher_is_better else (ratio > threshold):
+            flag = "  REGRESSION"
+            regressions += 1
+        print("{0:<32}{1:>14.6g}{2:>14.6g}{3:>10}{4}".format(key, old[key], new[key], change, flag))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--frames", type=int, default=50, help="Frames per measurement")
+    parser.add_argument("--tick-us", type=float, default=50, help="Modeled CPU time per scheduler pass, microseconds")
+    parser.add_argument("--ack-delay-us", type=float, default=20, help="K13988 time to acknowledge, microseconds")
+    parser.add_argument("--slow-ack-ms", type=float, default=2.5, help="K13988 time to acknowledge in slow_ack, milliseconds")
+    parser.add_argument("--ack-loss", type=float, nargs="*", default=[0.01, 0.05], help="Fractions of acks to drop")
+    parser.add_argument("--panels", type=int, nargs="*", default=[1, 2, 4],
+        help="Numbers of control panels to drive at once through K13988_Scheduler")
+    parser.add_argument("--output", help="Write JSON results to this file")
+    parser.add_argument("--compare", help="Compare against JSON results from an earlier run")
+    parser.add_argument("--threshold", type=float, default=0.05, help="Fractional change counted as regression")
+    args = parser.parse_args()
+
+    benchmark = Benchmark(args.frames, args.tick_us / 1e6, args.ack_delay_us / 1e6, args.slow_ack_ms / 1000)
+    current = dict(
+        format=RESULT_FORMAT,
+        config=dict(
+            frames=args.frames,
+            tick_us=args.tick_us,
+            ack_delay_us=args.ack_delay_us,
+            slow_ack_ms=args.slow_ack_ms,
+            baud_rate=BAUD_RATE,
+            bits_per_byte=BITS_PER_BYTE,
+            uart_tx_window=canon_mx340.uart_tx_window,
+            python=platform.python_version()),
+        results=benchmark.run(args.ack_loss, args.panels))
+
+    text = json.dumps(current, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w") as output_file:
+            output_file.write(text + "\n")
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            baseline = json.load(baseline_file)
+        if baseline.get("format") != RESULT_FORMAT:
+            sys.exit("Baseline {0} is in a different result format".format(args.compare))
+        if compare(baseline, current, args.threshold):
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
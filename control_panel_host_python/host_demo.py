@@ -0,0 +1,57 @@
+"""
+Run canon_mx340 library under desktop Python against a simulated K13988.
+
+Initializes the simulated control panel, presses a few keys via the
+simulator's script, draws a box for each key press, and prints the LCD image
+reconstructed by the simulator.
+
+Requires adafruit_framebuf: pip install adafruit-circuitpython-framebuf
+"""
+
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "control_panel_circuitpython", "lib"))
+import canon_mx340
+
+from k13988_simulator import K13988Simulator
+
+# Press and release Copy, then OK
+key_script = (
+    (0.2, canon_mx340.Keycode.COPY),
+    (0.1, canon_mx340.Keycode.NONE),
+    (0.2, canon_mx340.Keycode.OK),
+    (0.1, canon_mx340.Keycode.NONE),
+)
+
+async def main():
+    simulator = K13988Simulator(key_script)
+    simulator.start()
+    try:
+        async with canon_mx340.K13988(uart=simulator.port, enable=simulator) as k13988:
+            framebuffer = k13988.get_frame_buffer()
+            framebuffer.fill(0)
+            await k13988.refresh()
+
+            box_x = 4
+            presses = 0
+            async for key in k13988:
+                print(canon_mx340.keycode_string[key.key_number], "pressed" if key.pressed else "released")
+                if key.pressed:
+                    framebuffer.fill_rect(box_x, 4, 20, 20, 1)
+                    box_x += 30
+                    presses += 1
+                    await k13988.refresh()
+                    if presses == 2:
+                        break
+
+            await k13988.in_use_led(True)
+    finally:
+        simulator.stop()
+
+    print(simulator.frame_text())
+    print("In Use/Memory LED:", simulator.in_use_led, "  WiFi LED:", simulator.wifi_led)
+    print("Commands:", len(simulator.commands), "  Bulk bytes:", simulator.bulk_bytes_received)
+
+asyncio.run(main())
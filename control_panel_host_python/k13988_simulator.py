@@ -0,0 +1,264 @@
+# MIT License
+
+# Copyright (c) 2023 Roger Cheng
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Simulated K13988
+============================================================
+
+Plays the part of the NEC K13988 chip on a Canon Pixma MX340 control panel,
+so the `canon_mx340` CircuitPython library can run on a desktop computer
+(CPython on Linux or macOS) without hardware.
+
+The simulator sits on one end of a pseudo-terminal. `K13988Simulator.port`
+is the other end, wrapped in a minimal pyserial-style interface, to be
+given to `canon_mx340.K13988(uart=..., enable=...)`.
+
+Behavior follows what a logic analyzer showed of the real chip:
+* Every two byte command, and every bulk data transfer, is acknowledged
+  with 0x20. Acknowledgements can be dropped or delayed on request.
+* Key matrix scan codes are reported when enabled, then per a script.
+* LCD image is reconstructed from stripe select commands (0x04 0x4D,
+  0xCD, 0x2D, 0xAD, 0x6D) followed by 0x06 0xC4 bulk transfers.
+"""
+
+import asyncio
+import fcntl
+import os
+import random
+import termios
+import tty
+
+# Stripe select command parameters, in order from top of screen
+STRIPE_IDS = (0x4D, 0xCD, 0x2D, 0xAD, 0x6D)
+
+ACK = 0x20
+NO_BUTTON = 0x80
+
+class PtySerialPort:
+    """
+    Minimal pyserial-style port on a pseudo-terminal file descriptor.
+    Provides what `canon_mx340.K13988` uses: `in_waiting`, `read()`,
+    `readinto()` and `write()`.
+    """
+    def __init__(self, fd):
+        self._fd = fd
+        self._in_waiting = bytearray(4)
+
+    @property
+    def in_waiting(self):
+        """Number of bytes ready to read"""
+        fcntl.ioctl(self._fd, termios.FIONREAD, self._in_waiting)
+        return int.from_bytes(self._in_waiting, "little")
+
+    def read(self, size=1):
+        """Read up to `size` bytes"""
+        return os.read(self._fd, size)
+
+    def readinto(self, buffer):
+        """Read into buffer, returns number of bytes read"""
+        return os.readv(self._fd, [buffer])
+
+    def write(self, data):
+        """Write all of data, returns number of bytes written"""
+        view = memoryview(data)
+        while view:
+            written = os.write(self._fd, view)
+            view = view[written:]
+        return len(data)
+
+    def close(self):
+        os.close(self._fd)
+
+class K13988Simulator:
+    """
+    Simulated K13988 chip. Must be started from within a running asyncio
+    event loop. Also serves as K13988 `enable` object: setting `value` to
+    True after False resets the chip and starts reporting key scan codes.
+
+    :param key_script: Sequence of (seconds to wait, scan code) to report once
+        enabled, for example ((0.5, 0xA9), (0.1, 0x80)) to press and release Copy.
+    :param ack_drop_rate: Probability (0.0 to 1.0) of dropping each acknowledgement
+    :param ack_delay: Seconds between completion of a command and its acknowledgement
+    :param seed: Random seed for repeatable ack drops
+    """
+    def __init__(self, key_script=(), ack_drop_rate=0.0, ack_delay=0.0, seed=None):
+        self.key_script = key_script
+        self.ack_drop_rate = ack_drop_rate
+        self.ack_delay = ack_delay
+        self._random = random.Random(seed)
+
+        self.port = self._open_port()
+
+        self._loop = None
+        self._key_script_task = None
+        self._enabled = False
+        self.enabled_time = None
+        self.reset()
+
+    def reset(self):
+        """Return to power-up state"""
+        # Reconstructed LCD frame buffer, same layout as canon_mx340
+        self.frame = bytearray(196*5)
+        self.led_state = None
+        self.stripe = None
+        self.frames_received = 0
+
+        # Every (command, parameter) pair received, in order
+        self.commands = []
+        self.bytes_received = 0
+        self.bulk_bytes_received = 0
+        self.acks_sent = 0
+        self.acks_dropped = 0
+
+        self._command = None
+        self._bulk = bytearray()
+        self._bulk_remaining = 0
+
+    def _open_port(self):
+        """Create pseudo-terminal, returns port for K13988 driver end"""
+        self._master, slave = os.openpty()
+        tty.setraw(self._master)
+        tty.setraw(slave)
+        os.set_blocking(self._master, False)
+        return PtySerialPort(slave)
+
+    def start(self):
+        """Start listening to the pseudo-terminal"""
+        self._loop = asyncio.get_running_loop()
+        self._loop.add_reader(self._master, self._on_readable)
+
+    def stop(self):
+        """Stop listening and release pseudo-terminal"""
+        if self._key_script_task is not None:
+            self._key_script_task.cancel()
+        self._loop.remove_reader(self._master)
+        os.close(self._master)
+        self.port.close()
+
+    @property
+    def value(self):
+        """State of chip enable line"""
+        return self._enabled
+
+    @value.setter
+    def value(self, enabled):
+        if enabled and not self._enabled:
+            self.reset()
+            loop = asyncio.get_running_loop()
+            self.enabled_time = loop.time()
+            if self._key_script_task is not None:
+                self._key_script_task.cancel()
+            self._key_script_task = loop.create_task(self._run_key_script())
+        self._enabled = enabled
+
+    def send(self, data):
+        """Send bytes to K13988 driver"""
+        os.write(self._master, bytes(data))
+
+    async def _run_key_script(self):
+        """Report key scan codes"""
+        # Right after power-up, key matrix report is two bytes until initialized
+        self.send(bytes((NO_BUTTON, 0x40)))
+        for delay, scan_code in self.key_script:
+            await asyncio.sleep(delay)
+            self.send(bytes((scan_code,)))
+
+    def _on_readable(self):
+        try:
+            data = os.read(self._master, 4096)
+        except BlockingIOError:
+            return
+        for data_byte in data:
+            self._receive_byte(data_byte)
+
+    def _receive_byte(self, data_byte):
+        """Process one byte from K13988 driver"""
+        if not self._enabled:
+            return
+        self.bytes_received += 1
+        if self._bulk_remaining > 0:
+            self._bulk.append(data_byte)
+            self._bulk_remaining -= 1
+            if self._bulk_remaining == 0:
+                self._bulk_complete()
+                self._acknowledge()
+        elif self._command is None:
+            # Zero is not a valid command, ignore spurious data.
+            if data_byte != 0:
+                self._command = data_byte
+        else:
+            command = self._command
+            self._command = None
+            self.commands.append((command, data_byte))
+            self._execute(command, data_byte)
+            self._acknowledge()
+
+    def _execute(self, command, parameter):
+        if command == 0x04 and parameter in STRIPE_IDS:
+            self.stripe = STRIPE_IDS.index(parameter)
+        elif command == 0x06:
+            self._bulk_remaining = parameter
+            self._bulk = bytearray()
+        elif command == 0x0E:
+            self.led_state = parameter
+
+    def _bulk_complete(self):
+        self.bulk_bytes_received += len(self._bulk)
+        if self.stripe is not None and len(self._bulk) == 196:
+            start = self.stripe * 196
+            self.frame[start:start+196] = self._bulk
+            if self.stripe == len(STRIPE_IDS) - 1:
+                self.frames_received += 1
+
+    def _acknowledge(self):
+        if self.ack_drop_rate and self._random.random() < self.ack_drop_rate:
+            self.acks_dropped += 1
+            return
+        self.acks_sent += 1
+        if self.ack_delay:
+            self._loop.call_later(self.ack_delay, self.send, bytes((ACK,)))
+        else:
+            self.send(bytes((ACK,)))
+
+    def get_pixel(self, x, y):
+        """Returns 1 if reconstructed LCD pixel is on, 0 if off"""
+        return (self.frame[(y >> 3) * 196 + x] >> (7 - (y & 0x07))) & 0x01
+
+    def frame_text(self, height=34):
+        """Reconstructed LCD image as text, '#' for on and '.' for off"""
+        return "\n".join(
+            "".join("#" if self.get_pixel(x, y) else "." for x in range(196))
+            for y in range(height))
+
+    @property
+    def in_use_led(self):
+        """True if "In Use/Memory" LED is on, None if never set"""
+        if self.led_state is None:
+            return None
+        return 0 == (self.led_state & 0b0100)
+
+    @property
+    def wifi_led(self):
+        """True if "WiFi" LED is on, None if never set"""
+        if self.led_state is None:
+            return None
+        return 0 != (self.led_state & 0b0010)
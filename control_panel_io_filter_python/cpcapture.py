@@ -0,0 +1,247 @@
+"""
+Read and write serial captures, as CSV exported from Saleae Logic or as a
+compact memory-mapped binary format converted from it.
+
+CSV exports have one row per byte, for example:
+
+    From mainboard,data,48.4553772,4.20E-05,0x04,00000100
+
+Columns are analyzer name, row type, start time in seconds, duration, and
+byte value. Rows from the analyzer named as main board are main board
+data, rows from any other analyzer are control panel data. Rows that are
+not "data" (framing or parity errors) and header rows are skipped.
+
+That is around 50 bytes of text per byte on the wire. The binary format
+holds the same time, direction and value in a little over 5 bytes, and
+its time index allows jumping straight to any point in the capture.
+
+Binary format, all little-endian:
+* Header: see HEADER below.
+* Blocks of up to BLOCK_RECORDS records, stored as columns: time of each
+  byte as uint32 ticks from block base time, then byte values, then
+  direction bits (1 for control panel, least significant bit first),
+  padded to a multiple of 4 bytes.
+* Time index at `index_offset`: one INDEX_ENTRY per block, giving block
+  base time in ticks from capture start, number of first record, file
+  offset and record count.
+
+Convert with:
+
+    python3 cpcapture.py capture.csv capture.mxcap
+"""
+
+import argparse
+import array
+import bisect
+import csv
+import mmap
+import struct
+import sys
+
+MAGIC = b'MX340CAP'
+VERSION = 1
+
+# magic, version, reserved, tick length in nanoseconds, capture start time
+# in seconds, record count, block count, index offset
+HEADER = struct.Struct("<8sHHIdQQQ")
+
+# block base ticks, first record number, file offset, record count
+INDEX_ENTRY = struct.Struct("<QQQI4x")
+
+# Records per block. A block also ends early if its times would no longer
+# fit in uint32 ticks from block base.
+BLOCK_RECORDS = 65536
+
+# Saleae exports times to 0.1 microsecond, use ten nanosecond ticks
+TICK_NS = 10
+
+DEFAULT_MAIN_BOARD = "From mainboard"
+
+def capture_bytes(rows, main_board_name=DEFAULT_MAIN_BOARD):
+    """
+    Yields (time, is_main_board, byte value) from rows of a Saleae CSV export
+    """
+    for row in rows:
+        if len(row) < 5 or row[1] != "data":
+            continue
+        try:
+            timestamp = float(row[2])
+            value = int(row[4], 0)
+        except ValueError:
+            continue
+        yield timestamp, row[0] == main_board_name, value
+
+class CaptureWriter:
+    """
+    Write binary capture file one record at a time. Only one block is held
+    in memory. Must be closed to write the time index.
+    """
+    def __init__(self, path, tick_ns=TICK_NS):
+        self.file = open(path, "wb")
+        self.tick_ns = tick_ns
+        self.start_time = None
+        self.record_count = 0
+        self.index = []
+        self.file.write(b'\0' * HEADER.size)
+        self._new_block(0)
+
+    def _new_block(self, base_ticks):
+        self.block_base = base_ticks
+        self.block_ticks = array.array("I")
+        self.block_values = bytearray()
+        self.block_directions = bytearray()
+
+    def add(self, timestamp, is_main_board, value):
+        """Append one byte, captures must be added in time order"""
+        if self.start_time is None:
+            self.start_time = timestamp
+        ticks = round((timestamp - self.start_time) * 1e9 / self.tick_ns)
+        count = len(self.block_values)
+        if count >= BLOCK_RECORDS or ticks - self.block_base > 0xFFFFFFFF:
+            self._write_block()
+            self._new_block(ticks)
+            count = 0
+        self.block_ticks.append(ticks - self.block_base)
+        self.block_values.append(value)
+        if count & 7 == 0:
+            self.block_directions.append(0)
+        if not is_main_board:
+            self.block_directions[count >> 3] |= 1 << (count & 7)
+
+    def _write_block(self):
+        count = len(self.block_values)
+        if count == 0:
+            return
+        self.index.append((self.block_base, self.record_count, self.file.tell(), count))
+        if sys.byteorder != "little":
+            self.block_ticks.byteswap()
+        self.file.write(self.block_ticks.tobytes())
+        self.file.write(self.block_values)
+        self.file.write(self.block_directions)
+        self.file.write(b'\0' * (-(count + len(self.block_directions)) % 4))
+        self.record_count += count
+
+    def close(self):
+        self._write_block()
+        index_offset = self.file.tell()
+        for entry in self.index:
+            self.file.write(INDEX_ENTRY.pack(*entry))
+        self.file.seek(0)
+        self.file.write(HEADER.pack(MAGIC, VERSION, 0, self.tick_ns, self.start_time or 0.0,
+            self.record_count, len(self.index), index_offset))
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+class CaptureReader:
+    """Memory-mapped binary capture file"""
+    def __init__(self, path):
+        with open(path, "rb") as capture_file:
+            self.map = mmap.mmap(capture_file.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, _, self.tick_ns, self.start_time,
+            self.record_count, block_count, index_offset) = HEADER.unpack_from(self.map)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("{0} is not a version {1} capture file".format(path, VERSION))
+        self.tick = self.tick_ns / 1e9
+        self.blocks = [INDEX_ENTRY.unpack_from(self.map, index_offset + block * INDEX_ENTRY.size)
+            for block in range(block_count)]
+        self.block_bases = [block[0] for block in self.blocks]
+
+    def _ticks(self, timestamp):
+        return round((timestamp - self.start_time) / self.tick)
+
+    def _block_columns(self, block):
+        """Returns (ticks, values, directions) columns of one block"""
+        _, _, offset, count = self.blocks[block]
+        view = memoryview(self.map)
+        ticks = view[offset:offset + count * 4]
+        if sys.byteorder == "little":
+            ticks = ticks.cast("I")
+        else:
+            ticks = array.array("I", ticks)
+            ticks.byteswap()
+        offset += count * 4
+        values = view[offset:offset + count]
+        directions = view[offset + count:offset + count + (count + 7) // 8]
+        return ticks, values, directions
+
+    def records(self, start=None, end=None):
+        """
+        Yields (time, is_main_board, byte value) for every byte from
+        `start` time up to and including `end` time, both in seconds as in
+        the original capture. Starting point is found from the time index
+        without reading anything before it.
+        """
+        block = 0
+        first = 0
+        if start is not None and self.blocks:
+            start_ticks = self._ticks(start)
+            block = max(0, bisect.bisect_right(self.block_bases, start_ticks) - 1)
+            ticks, _, _ = self._block_columns(block)
+            first = bisect.bisect_left(ticks, start_ticks - self.block_bases[block])
+        end_ticks = None if end is None else self._ticks(end)
+
+        for block in range(block, len(self.blocks)):
+            base = self.block_bases[block]
+            if end_ticks is not None and base > end_ticks:
+                return
+            ticks, values, directions = self._block_columns(block)
+            for record in range(first, len(values)):
+                record_ticks = base + ticks[record]
+                if end_ticks is not None and record_ticks > end_ticks:
+                    return
+                yield (self.start_time + record_ticks * self.tick,
+                    not (directions[record >> 3] >> (record & 7)) & 1,
+                    values[record])
+            first = 0
+
+    def close(self):
+        self.map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+def is_binary_capture(path):
+    with open(path, "rb") as capture_file:
+        return capture_file.read(len(MAGIC)) == MAGIC
+
+def read_capture(path, main_board_name=DEFAULT_MAIN_BOARD, start=None, end=None):
+    """
+    Yields (time, is_main_board, byte value) from a binary capture or a
+    CSV export, limited to bytes between `start` and `end` time if given.
+    `main_board_name` only applies to CSV.
+    """
+    if is_binary_capture(path):
+        with CaptureReader(path) as reader:
+            yield from reader.records(start, end)
+        return
+    with open(path, newline="") as csv_file:
+        for record in capture_bytes(csv.reader(csv_file), main_board_name):
+            if start is not None and record[0] < start:
+                continue
+            if end is not None and record[0] > end:
+                return
+            yield record
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert Saleae CSV export to binary capture file")
+    parser.add_argument("csv", help="Saleae async serial CSV export")
+    parser.add_argument("output", help="Binary capture file to write")
+    parser.add_argument("--main-board", default=DEFAULT_MAIN_BOARD,
+        help="Analyzer name of main board to control panel data (default: %(default)s)")
+    args = parser.parse_args()
+
+    with CaptureWriter(args.output) as writer, open(args.csv, newline="") as csv_file:
+        for timestamp, is_main_board, value in capture_bytes(csv.reader(csv_file), args.main_board):
+            writer.add(timestamp, is_main_board, value)
+    print(args.output, writer.record_count, "bytes in", len(writer.index), "blocks")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+"""
+Decoder for serial traffic between Canon Pixma MX340 main board and its
+control panel. Independent of where the data comes from: cpfilter feeds it
+live from serial ports, cpreplay from logic analyzer CSV exports.
+"""
+
+known_commands = {
+    (( 0x04, 0x0E )) : "Standby 4",
+    (( 0x04, 0x14 )) : "Standby 3",
+    (( 0x04, 0x34 )) : "Standby 2/Startup 2.5",
+    (( 0x04, 0x42 )) : "Startup 5",
+    (( 0x04, 0x4D ), ( 0x04, 0xC8 ), ( 0x04, 0x30 ),
+     ( 0x04, 0xCD ), ( 0x04, 0xC8 ), ( 0x04, 0x30 ),
+     ( 0x04, 0x2D ), ( 0x04, 0xC8 ), ( 0x04, 0x30 ),
+     ( 0x04, 0xAD ), ( 0x04, 0xC8 ), ( 0x04, 0x30 ),
+     ( 0x04, 0x6D ), ( 0x04, 0xC8 ), ( 0x04, 0x30 )):
+     "LCD screen update (1020 bytes)",
+    (( 0x04, 0x74 )) : "Startup 3",
+    (( 0x04, 0x75 )) : "LCD sleep",
+    (( 0x04, 0xB4 )) : "Standby 1",
+    (( 0x04, 0xD5 ), ( 0x04, 0x85 ), ( 0x04, 0x03 ), ( 0x04, 0xc5 )):
+     "Startup 2 (8 bytes)",
+    (( 0x04, 0xEE )) : "Standby 5",
+    (( 0x04, 0xF4 ), ( 0x04, 0x44 ), ( 0x04, 0x81 ), ( 0x04, 0x04 )):
+     "Startup 4 (8 bytes)",
+    (( 0x04, 0xF5 )) : "LCD wake",
+    (( 0x0D, 0x3F ), ( 0x0C, 0xE1 ), ( 0x07, 0xA1 ), ( 0x03, 0x00 ), ( 0x01 , 0x00 )):
+     "Startup 1 (10 bytes)",
+    (( 0xFE, 0xDC )) : "Hello"
+}
+
+CONTROL_PANEL_ACK       = 0x20  # Acknowledgement of main board commands
+CONTROL_PANEL_NO_BUTTON = 0x80  # Default scan code for "no button pressed"
+
+# Seconds of silence from main board after which a partial command sequence
+# is reported as unknown. Commands within a sequence arrive well under a
+# millisecond apart.
+MAIN_BOARD_TIMEOUT      = 0.1
+
+MAIN_BOARD_PREFIX       = "Main Board:"
+CONTROL_PANEL_PREFIX    = "    Control Panel:"
+
+def command_steps(known_command):
+    """
+    Returns known_commands key as a tuple of (command, parameter) steps.
+    Python parentheses around a single step do not make a tuple of one
+    step, so those keys are a bare (command, parameter) pair.
+    """
+    if isinstance(known_command[0], int):
+        return (known_command,)
+    return known_command
+
+class CommandTrieNode:
+    """
+    One node of prefix trie compiled from known_commands. Each node is a
+    command sequence prefix, `children` maps the next (command, parameter)
+    step to the node for the longer prefix. `name` is set on nodes that
+    complete a known command.
+    """
+    def __init__(self):
+        self.name = None
+        self.children = dict()
+
+def compile_commands(commands):
+    """Compile dictionary of known command sequences into a prefix trie"""
+    root = CommandTrieNode()
+    for known_command, name in commands.items():
+        node = root
+        for step in command_steps(known_command):
+            if node.name is not None:
+                raise ValueError("{0} can never match, its prefix matches {1} first".format(name, node.name))
+            node = node.children.setdefault(step, CommandTrieNode())
+        if node.name is not None:
+            raise ValueError("{0} and {1} are the same sequence".format(node.name, name))
+        if node.children:
+            raise ValueError("{0} would match before longer sequences beginning the same way".format(name))
+        node.name = name
+    return root
+
+class CommandFilter:
+    """
+    Decode traffic between main board and control panel, printing known
+    command sequences by name and everything else as raw values.
+
+    Data from each side is fed in as it arrives. `check_timeout()` must be
+    called when main board has been quiet, `timeout()` says when. Times
+    are in seconds and only need to be consistent with each other, so they
+    can come from a clock or from timestamps in a capture file.
+
+    Decoded lines are passed to `output`, called with the same arguments
+    as `print`.
+    """
+    def __init__(self, commands=known_commands, output=print):
+        self.output = output
+
+        # Main board
+        self.command_trie = compile_commands(commands)
+        self.command_node = self.command_trie # Node matching command_sequence
+        self.bulk_transfer_remaining = 0
+        self.awaiting_command = True
+        self.command = 0
+        self.command_sequence = list()
+        self.main_board_last_time = 0.0
+
+        # Control panel
+        self.previous_control_panel_byte = CONTROL_PANEL_NO_BUTTON
+
+        # Both
+        self.ack_expected = 0
+
+    def main_board_data(self, new_bytes, now):
+        """Process bytes sent by main board, received at time `now`"""
+        self.main_board_last_time = now
+        for new_byte in new_bytes:
+            if self.bulk_transfer_remaining > 0:
+                self.bulk_transfer_remaining -= 1
+                if self.bulk_transfer_remaining == 0:
+                    self.ack_expected += 1
+                    self.awaiting_command = True
+            elif self.awaiting_command:
+                # Zero is not a valid command, ignore spurious data.
+                if new_byte != 0:
+                    # New byte is our next command
+                    self.command = new_byte
+                    self.awaiting_command = False
+            else:
+                self.main_board_command(self.command, new_byte)
+
+    def main_board_command(self, command, parameter):
+        """Process one complete two byte command from main board"""
+        # Parse and respond to select commands
+        match command:
+            case 0x06:
+                # 0x06 is a bulk transfer command, its parameter is length in bytes.
+                self.bulk_transfer_remaining = parameter
+
+                # Bulk transfer command is understood and
+                # is not part of any command sequence
+            case 0x0E:
+                # 0x0E updates pins controlling some onboard LEDs
+                led_inuse = "OFF"
+                led_wifi = "OFF"
+                if 0==(parameter & 0b0100):
+                    led_inuse = "ON "
+                if 0!=(parameter & 0b0010):
+                    led_wifi = "ON "
+                self.output(MAIN_BOARD_PREFIX, "LED update: [In Use/Memory]",led_inuse,"   [WiFi]",led_wifi)
+
+                # Onboard LED update command is understood and
+                # is not part of any command sequence
+            case _:
+                self.match_step((command, parameter))
+
+        self.ack_expected += 1
+        self.awaiting_command = True
+
+    def match_step(self, step):
+        """Advance command sequence through prefix trie by one step"""
+        next_node = self.command_node.children.get(step)
+        if next_node is None and self.command_node is not self.command_trie:
+            # Sequence so far can not be completed to any known command.
+            # Report it, then see if this step starts a new one.
+            self.report_unknown()
+            next_node = self.command_trie.children.get(step)
+
+        self.command_sequence.append(step)
+        if next_node is None:
+            # Does not start any known command either
+            self.report_unknown()
+        elif next_node.name is not None:
+            self.output(MAIN_BOARD_PREFIX,next_node.name)
+            self.command_sequence.clear()
+            self.command_node = self.command_trie
+        else:
+            self.command_node = next_node
+
+    def report_unknown(self):
+        """Print command sequence that matched no known command and start over"""
+        self.output(MAIN_BOARD_PREFIX,"UNKNOWN COMMAND " + "".join(
+            "( {0} , {1} ), ".format(hex(step[0]), hex(step[1])) for step in self.command_sequence))
+        self.command_sequence.clear()
+        self.command_node = self.command_trie
+
+    def timeout(self, now):
+        """
+        Seconds until a partial command sequence should be reported as
+        unknown, None if there is nothing to report.
+        """
+        if len(self.command_sequence) == 0:
+            return None
+        return max(0.0, self.main_board_last_time + MAIN_BOARD_TIMEOUT - now)
+
+    def check_timeout(self, now):
+        """Report partial command sequence if main board has gone quiet"""
+        if len(self.command_sequence) > 0 and now - self.main_board_last_time >= MAIN_BOARD_TIMEOUT:
+            self.report_unknown()
+
+    def control_panel_data(self, new_control_panel_bytes):
+        """Process bytes sent by control panel"""
+        for new_control_panel_byte in new_control_panel_bytes:
+            if (new_control_panel_byte == CONTROL_PANEL_ACK):
+                self.ack_expected -= 1
+            elif (new_control_panel_byte != self.previous_control_panel_byte):
+                if new_control_panel_byte == CONTROL_PANEL_NO_BUTTON:
+                    description = "button released"
+                elif new_control_panel_byte == 0x40:
+                    description = "expected but unknown"
+                elif new_control_panel_byte >= 0x89 and new_control_panel_byte <=0xCC:
+                    description = "button scan code"
+                else:
+                    description = "-- NOVEL VALUE? --"
+                self.output(CONTROL_PANEL_PREFIX,hex(new_control_panel_byte),description)
+                self.previous_control_panel_byte = new_control_panel_byte
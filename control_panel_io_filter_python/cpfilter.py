@@ -1,29 +1,38 @@
+"""
+Decode live serial traffic between Canon Pixma MX340 main board and
+control panel, using two USB serial adapters.
+
+By default only listens: each adapter's receive line is tapped onto one
+direction of the connection.
+
+With --proxy, sits in the middle instead. Main board is wired to one
+adapter and control panel to the other, and everything received on one is
+forwarded out the other. While proxying:
+* Command sequences typed on standard input, as hex bytes such as
+  "0E F9", are injected toward the control panel between main board
+  commands. Control panel acknowledgements of injected commands are kept
+  from the main board.
+* --rewrite replaces two byte commands from the main board on the way
+  through, for example --rewrite 0E,FD=0E,F9 to turn on both LEDs.
+* Time from receiving data to forwarding it is measured and reported
+  every --report seconds.
+
+Decoding happens on a separate thread so it does not delay forwarding.
+
+Requires pyserial: pip install pyserial
+"""
+
+import argparse
+import collections
+import queue
+import selectors
+import sys
+import threading
+import time
+
 import serial
 
-known_commands = {
-    (( 0x04, 0x0E )) : "Standby 4",
-    (( 0x04, 0x14 )) : "Standby 3",
-    (( 0x04, 0x34 )) : "Standby 2/Startup 2.5",
-    (( 0x04, 0x42 )) : "Startup 5",
-    (( 0x04, 0x4D ), ( 0x04, 0xC8 ), ( 0x04, 0x30 ),
-     ( 0x04, 0xCD ), ( 0x04, 0xC8 ), ( 0x04, 0x30 ),
-     ( 0x04, 0x2D ), ( 0x04, 0xC8 ), ( 0x04, 0x30 ),
-     ( 0x04, 0xAD ), ( 0x04, 0xC8 ), ( 0x04, 0x30 ),
-     ( 0x04, 0x6D ), ( 0x04, 0xC8 ), ( 0x04, 0x30 )):
-     "LCD screen update (1020 bytes)",
-    (( 0x04, 0x74 )) : "Startup 3",
-    (( 0x04, 0x75 )) : "LCD sleep",
-    (( 0x04, 0xB4 )) : "Standby 1",
-    (( 0x04, 0xD5 ), ( 0x04, 0x85 ), ( 0x04, 0x03 ), ( 0x04, 0xc5 )):
-     "Startup 2 (8 bytes)",
-    (( 0x04, 0xEE )) : "Standby 5",
-    (( 0x04, 0xF4 ), ( 0x04, 0x44 ), ( 0x04, 0x81 ), ( 0x04, 0x04 )):
-     "Startup 4 (8 bytes)",
-    (( 0x04, 0xF5 )) : "LCD wake",
-    (( 0x0D, 0x3F ), ( 0x0C, 0xE1 ), ( 0x07, 0xA1 ), ( 0x03, 0x00 ), ( 0x01 , 0x00 )):
-     "Startup 1 (10 bytes)",
-    (( 0xFE, 0xDC )) : "Hello"
-}
+from cpdecoder import CommandFilter, CONTROL_PANEL_ACK
 
 serial_parameters = {
     "baudrate":250000,
@@ -32,112 +41,282 @@ serial_parameters = {
     "stopbits":serial.STOPBITS_ONE
 }
 
-CONTROL_PANEL_ACK       = 0x20  # Acknowledgement of main board commands
-CONTROL_PANEL_NO_BUTTON = 0x80  # Default scan code for "no button pressed"
+MAIN_BOARD_PORT    = '/dev/cu.usbserial-ABSCE0EZ'
+CONTROL_PANEL_PORT = '/dev/cu.usbserial-AO002W1A'
 
-MAIN_BOARD_TIMEOUT      = 10000 # Inaccurate timer highly dependent on CPU speed
+def read_available(port):
+    """Read everything waiting on a serial port that selector reported ready"""
+    return port.read(max(1, port.in_waiting))
 
-MAIN_BOARD_PREFIX       = "Main Board:"
-CONTROL_PANEL_PREFIX    = "    Control Panel:"
+def parse_hex_bytes(text):
+    """Parse text such as "0E F9" or "0x0E,0xF9" into bytes"""
+    return bytes(int(value, 16) for value in text.replace(",", " ").split())
 
-with serial.Serial(
-    port='/dev/cu.usbserial-ABSCE0EZ', **serial_parameters) as main_board, serial.Serial(
-    port='/dev/cu.usbserial-AO002W1A', **serial_parameters) as control_panel:
-    # Main board
-    bulk_transfer_remaining = 0
-    awaiting_command = True
-    command = 0
-    command_sequence = list()
-    main_board_idle_count = 0 # Counter for bad timekeeping
+def parse_injection(text):
+    """
+    Parse hex bytes into list of command units, each acknowledged once by
+    the control panel: two byte commands, and the data following a 0x06
+    bulk transfer command. Raises ValueError if incomplete.
+    """
+    data = parse_hex_bytes(text)
+    units = []
+    index = 0
+    while index < len(data):
+        command = data[index:index + 2]
+        if len(command) < 2 or command[0] == 0:
+            raise ValueError("Incomplete or invalid command at byte {0}".format(index))
+        units.append(command)
+        index += 2
+        if command[0] == 0x06 and command[1] > 0:
+            bulk = data[index:index + command[1]]
+            if len(bulk) < command[1]:
+                raise ValueError("Bulk transfer needs {0} bytes, has {1}".format(command[1], len(bulk)))
+            units.append(bulk)
+            index += command[1]
+    return units
 
-    # Control panel
-    previous_control_panel_byte = CONTROL_PANEL_NO_BUTTON
+def parse_rewrite(text):
+    """Parse "0E,FD=0E,F9" into ((0x0E, 0xFD), (0x0E, 0xF9))"""
+    try:
+        original, replacement = text.split("=")
+        original = tuple(parse_hex_bytes(original))
+        replacement = tuple(parse_hex_bytes(replacement))
+    except ValueError:
+        raise argparse.ArgumentTypeError("Expected command=command in hex, such as 0E,FD=0E,F9")
+    if len(original) != 2 or len(replacement) != 2 or 0x06 in (original[0], replacement[0]):
+        raise argparse.ArgumentTypeError("Rewrite must be two byte command=command, not bulk transfer")
+    return original, replacement
 
-    # Both
-    ack_expected = 0
+class LatencyReport:
+    """Collect latency samples in nanoseconds, summarized on request"""
+    def __init__(self, name):
+        self.name = name
+        self.samples = []
 
-    while(True):
-        if main_board.in_waiting > 0:
-            main_board_idle_count = 0
-            # Read available data
-            new_bytes = main_board.read(main_board.in_waiting)
-            for new_byte in new_bytes:
-                if bulk_transfer_remaining > 0:
-                    bulk_transfer_remaining -= 1
-                    if bulk_transfer_remaining == 0:
-                        ack_expected += 1
-                        awaiting_command = True
-                elif awaiting_command:
-                    # Zero is not a valid command, ignore spurious data.
-                    if new_byte != 0:
-                        # New byte is our next command
-                        command = new_byte
-                        awaiting_command = False
+    def add(self, nanoseconds):
+        self.samples.append(nanoseconds)
+
+    def report(self):
+        """Returns summary of samples since last report, and clears them"""
+        samples = sorted(self.samples)
+        self.samples.clear()
+        if not samples:
+            return "{0}: none".format(self.name)
+        return "{0}: n={1} mean={2:.0f}us p99={3:.0f}us max={4:.0f}us".format(
+            self.name, len(samples), sum(samples) / len(samples) / 1000,
+            samples[min(len(samples) - 1, int(len(samples) * 0.99))] / 1000, samples[-1] / 1000)
+
+class Proxy:
+    """
+    Forward data between main board and control panel ports, injecting and
+    rewriting commands at command boundaries. Forwarded data is passed to
+    `decode(is_main_board, data, time)` afterwards.
+    """
+    def __init__(self, main_board, control_panel, decode, rewrites=()):
+        self.main_board = main_board
+        self.control_panel = control_panel
+        self.decode = decode
+        self.rewrites = dict(rewrites)
+        self.rewrite_commands = set(original[0] for original in self.rewrites)
+
+        # Main board command parsing, to find command boundaries
+        self.command = None
+        self.bulk_remaining = 0
+
+        # Command units waiting for a boundary to be injected
+        self.injections = collections.deque()
+
+        # One entry per command unit sent to control panel awaiting its
+        # acknowledgement, in order. perf_counter_ns() time sent if
+        # injected, None if from main board.
+        self.acks_owed = collections.deque()
+
+        self.forward_latency = LatencyReport("Forwarding latency")
+        self.injected_round_trip = LatencyReport("Injected command round trip")
+        self.rewrite_count = 0
+
+    def at_boundary(self):
+        """True if main board is between commands"""
+        return self.command is None and self.bulk_remaining == 0
+
+    def inject(self, units):
+        """Queue command units to send to control panel at next boundary"""
+        self.injections.extend(units)
+        if self.at_boundary():
+            # Main board is between commands, no need to wait for more data
+            output = bytearray()
+            self._add_injections(output)
+            self.control_panel.write(output)
+            self.decode(True, bytes(output), time.monotonic())
+
+    def _add_injections(self, output):
+        now = time.perf_counter_ns()
+        while self.injections:
+            output += self.injections.popleft()
+            self.acks_owed.append(now)
+
+    def from_main_board(self, data, received):
+        """Forward data from main board, received at perf_counter_ns() time"""
+        output = bytearray()
+        index = 0
+        length = len(data)
+        while index < length:
+            if self.bulk_remaining > 0:
+                # Pass bulk data through in one piece
+                count = min(self.bulk_remaining, length - index)
+                output += data[index:index + count]
+                index += count
+                self.bulk_remaining -= count
+                if self.bulk_remaining == 0:
+                    self.acks_owed.append(None)
+            elif self.command is None:
+                data_byte = data[index]
+                index += 1
+                if data_byte == 0:
+                    # Zero is not a valid command, pass along spurious data.
+                    output.append(data_byte)
+                    continue
+                self.command = data_byte
+                # Hold back commands that may be rewritten until complete
+                if data_byte not in self.rewrite_commands:
+                    output.append(data_byte)
+            else:
+                parameter = data[index]
+                index += 1
+                command = self.command
+                self.command = None
+                if command in self.rewrite_commands:
+                    replacement = self.rewrites.get((command, parameter))
+                    if replacement is not None:
+                        self.rewrite_count += 1
+                        command, parameter = replacement
+                    output.append(command)
+                output.append(parameter)
+                if command == 0x06 and parameter > 0:
+                    self.bulk_remaining = parameter
                 else:
-                    command_sequence.append((command, new_byte))
-
-                    # Parse and respond to select commands
-                    match command:
-                        case 0x06:
-                            # 0x06 is a bulk transfer command, its parameter is length in bytes.
-                            bulk_transfer_remaining = new_byte
-
-                            # Bulk transfer command is understood and
-                            # can be removed from running command list
-                            command_sequence.pop()
-                        case 0x0E:
-                            # 0x0E updates pins controlling some onboard LEDs
-                            led_inuse = "OFF"
-                            led_wifi = "OFF"
-                            if 0==(new_byte & 0b0100):
-                                led_inuse = "ON "
-                            if 0!=(new_byte & 0b0010):
-                                led_wifi = "ON "
-                            print(MAIN_BOARD_PREFIX, "LED update: [In Use/Memory]",led_inuse,"   [WiFi]",led_wifi)
-
-                            # Onboard LED update command is understood and
-                            # can be removed from running command list
-                            command_sequence.pop()
-
-                    ack_expected += 1
-                    awaiting_command = True
-
-                    # See if the current command sequence matches any known
-                    candidate_command = tuple(command_sequence)
-                    if len(command_sequence) == 1:
-                        # Stumbled across a Python special case I don't understand
-                        # turning single length lists into tuples. This is a
-                        # workaround until I learn how to do this properly.
-                        candidate_command = tuple(command_sequence[0])
-
-                    if candidate_command in known_commands:
-                        print(MAIN_BOARD_PREFIX,known_commands[candidate_command])
-                        command_sequence.clear()
-
-        elif main_board_idle_count > MAIN_BOARD_TIMEOUT and len(command_sequence)>0:
-            print(MAIN_BOARD_PREFIX,"UNKNOWN COMMAND ",end='')
-            for step in command_sequence:
-                print("(",hex(step[0]), ',', hex(step[1]),"), ",end='')
-            print("")
-            command_sequence.clear()
+                    self.acks_owed.append(None)
+            if self.injections and self.at_boundary():
+                self._add_injections(output)
+        self.control_panel.write(output)
+        self.forward_latency.add(time.perf_counter_ns() - received)
+        self.decode(True, bytes(output), time.monotonic())
+
+    def from_control_panel(self, data, received):
+        """Forward data from control panel, keeping acks of injected commands"""
+        output = bytearray()
+        for data_byte in data:
+            if data_byte == CONTROL_PANEL_ACK and self.acks_owed:
+                injected_time = self.acks_owed.popleft()
+                if injected_time is not None:
+                    self.injected_round_trip.add(received - injected_time)
+                    continue
+            output.append(data_byte)
+        if output:
+            self.main_board.write(output)
+            self.forward_latency.add(time.perf_counter_ns() - received)
+        self.decode(False, data, time.monotonic())
+
+    def report(self):
+        print(self.forward_latency.report())
+        print(self.injected_round_trip.report())
+        if self.rewrites:
+            print("Commands rewritten:", self.rewrite_count)
+
+def decoder_thread(command_filter, decode_queue):
+    """Decode data queued by forwarding loop, off the forwarding path"""
+    while True:
+        try:
+            is_main_board, data, received = decode_queue.get(timeout=command_filter.timeout(time.monotonic()))
+        except queue.Empty:
+            command_filter.check_timeout(time.monotonic())
+            continue
+        if is_main_board:
+            command_filter.main_board_data(data, received)
         else:
-            main_board_idle_count += 1
-
-        if (control_panel.in_waiting > 0):
-            # Read available data
-            new_control_panel_bytes = control_panel.read(control_panel.in_waiting)
-
-            for new_control_panel_byte in new_control_panel_bytes:
-                if (new_control_panel_byte == CONTROL_PANEL_ACK):
-                    ack_expected -= 1
-                elif (new_control_panel_byte != previous_control_panel_byte):
-                    print(CONTROL_PANEL_PREFIX,hex(new_control_panel_byte), end=' ')
-                    if new_control_panel_byte == CONTROL_PANEL_NO_BUTTON:
-                        print("button released")
-                    elif new_control_panel_byte == 0x40:
-                        print("expected but unknown")
-                    elif new_control_panel_byte >= 0x89 and new_control_panel_byte <=0xCC:
-                        print("button scan code")
-                    else:
-                        print("-- NOVEL VALUE? --")
-                    previous_control_panel_byte = new_control_panel_byte
+            command_filter.control_panel_data(data)
+        command_filter.check_timeout(time.monotonic())
+
+def set_low_latency(port):
+    """Ask serial driver to deliver received data immediately, if supported"""
+    try:
+        port.set_low_latency_mode(True)
+    except (AttributeError, ValueError, OSError):
+        pass
+
+def run_proxy(main_board, control_panel, rewrites, report_interval):
+    for port in (main_board, control_panel):
+        set_low_latency(port)
+
+    decode_queue = queue.SimpleQueue()
+    threading.Thread(target=decoder_thread, args=(CommandFilter(), decode_queue), daemon=True).start()
+    proxy = Proxy(main_board, control_panel,
+        lambda is_main_board, data, received: decode_queue.put((is_main_board, data, received)),
+        rewrites)
+
+    selector = selectors.DefaultSelector()
+    selector.register(main_board, selectors.EVENT_READ)
+    selector.register(control_panel, selectors.EVENT_READ)
+    selector.register(sys.stdin, selectors.EVENT_READ)
+
+    next_report = time.monotonic() + report_interval
+    while(True):
+        for key, _ in selector.select(max(0.0, next_report - time.monotonic())):
+            if key.fileobj is main_board:
+                data = read_available(main_board)
+                proxy.from_main_board(data, time.perf_counter_ns())
+            elif key.fileobj is control_panel:
+                data = read_available(control_panel)
+                proxy.from_control_panel(data, time.perf_counter_ns())
+            else:
+                line = sys.stdin.readline()
+                if not line:
+                    selector.unregister(sys.stdin)
+                    continue
+                try:
+                    proxy.inject(parse_injection(line))
+                except ValueError as error:
+                    print("Not injected:", error)
+        if time.monotonic() >= next_report:
+            proxy.report()
+            next_report = time.monotonic() + report_interval
+
+def run_filter(main_board, control_panel):
+    command_filter = CommandFilter()
+
+    # Sleep until either port has data, or until a partial command
+    # sequence times out, instead of polling in_waiting.
+    selector = selectors.DefaultSelector()
+    selector.register(main_board, selectors.EVENT_READ)
+    selector.register(control_panel, selectors.EVENT_READ)
+
+    while(True):
+        for key, _ in selector.select(command_filter.timeout(time.monotonic())):
+            if key.fileobj is main_board:
+                command_filter.main_board_data(read_available(main_board), time.monotonic())
+            else:
+                command_filter.control_panel_data(read_available(control_panel))
+        command_filter.check_timeout(time.monotonic())
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--main-board", default=MAIN_BOARD_PORT,
+        help="Serial port receiving main board data (default: %(default)s)")
+    parser.add_argument("--control-panel", default=CONTROL_PANEL_PORT,
+        help="Serial port receiving control panel data (default: %(default)s)")
+    parser.add_argument("--proxy", action="store_true", help="Forward data between ports")
+    parser.add_argument("--rewrite", type=parse_rewrite, action="append", default=[],
+        help="With --proxy, replace main board command, for example 0E,FD=0E,F9")
+    parser.add_argument("--report", type=float, default=10, help="Seconds between --proxy latency reports")
+    args = parser.parse_args()
+
+    with serial.Serial(
+        port=args.main_board, **serial_parameters) as main_board, serial.Serial(
+        port=args.control_panel, **serial_parameters) as control_panel:
+        if args.proxy:
+            run_proxy(main_board, control_panel, args.rewrite, args.report)
+        else:
+            run_filter(main_board, control_panel)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""
+Reconstruct LCD frames from logic analyzer captures into image files.
+
+Streams Saleae async serial CSV exports or binary captures (see cpcapture) and
+watches main board data for LCD stripe select commands (0x04 0x4D, 0xCD,
+0x2D, 0xAD, 0x6D) each followed by a 0x06 0xC4 bulk transfer of 196 bytes.
+Every byte of a stripe is one column of eight pixels, most significant bit
+at top, the same layout as canon_mx340 MVMSBFormat. Five stripes make a
+196x40 frame.
+
+Each frame is written as a PBM or PNG image, and a line is added to
+index.csv in the output directory: frame number, capture time of first and
+last stripe, which stripes were updated, and image file name.
+"""
+
+import argparse
+import csv
+import os
+import struct
+import zlib
+
+from cpcapture import read_capture, DEFAULT_MAIN_BOARD
+
+# Parameters of stripe select command (0x04) in order from top of screen
+STRIPE_IDS = (0x4D, 0xCD, 0x2D, 0xAD, 0x6D)
+
+STRIPE_WIDTH = 196
+STRIPE_COUNT = len(STRIPE_IDS)
+FRAME_HEIGHT = STRIPE_COUNT * 8
+
+# Image rows are packed eight pixels to a byte, padded to whole bytes
+ROW_BYTES = (STRIPE_WIDTH + 7) // 8
+ROW_PADDING = b'0' * (ROW_BYTES * 8 - STRIPE_WIDTH)
+
+def _bit_tables(on, off):
+    """
+    bytes.translate() tables, one per pixel row within a stripe, mapping
+    column byte to `on` if that row's pixel is set, `off` if not.
+    """
+    return [bytes(on if column & (0x80 >> row) else off for column in range(256)) for row in range(8)]
+
+# ASCII digit per pixel, for int(digits, 2) to pack a whole row at once.
+# PBM uses 1 for black (pixel on), 1-bit grayscale PNG uses 1 for white.
+PBM_TABLES = _bit_tables(ord('1'), ord('0'))
+PNG_TABLES = _bit_tables(ord('0'), ord('1'))
+
+def frame_rows(frame, tables):
+    """Yields each row of frame packed eight pixels per byte, MSB first"""
+    for stripe in range(STRIPE_COUNT):
+        columns = frame[stripe * STRIPE_WIDTH:(stripe + 1) * STRIPE_WIDTH]
+        for row in range(8):
+            digits = columns.translate(tables[row]) + ROW_PADDING
+            yield int(digits, 2).to_bytes(ROW_BYTES, "big")
+
+def pbm_image(frame):
+    """Frame as binary PBM (P4) image file content"""
+    header = "P4\n{0} {1}\n".format(STRIPE_WIDTH, FRAME_HEIGHT).encode()
+    return header + b''.join(frame_rows(frame, PBM_TABLES))
+
+def _png_chunk(chunk_type, data):
+    return struct.pack(">I", len(data)) + chunk_type + data + struct.pack(">I", zlib.crc32(chunk_type + data))
+
+def png_image(frame):
+    """Frame as 1-bit grayscale PNG image file content"""
+    # Every row is preceded by filter type 0 (none)
+    raw = b''.join(b'\x00' + row for row in frame_rows(frame, PNG_TABLES))
+    return (b'\x89PNG\r\n\x1a\n' +
+        _png_chunk(b'IHDR', struct.pack(">IIBBBBB", STRIPE_WIDTH, FRAME_HEIGHT, 1, 0, 0, 0, 0)) +
+        _png_chunk(b'IDAT', zlib.compress(raw)) +
+        _png_chunk(b'IEND', b''))
+
+class LcdFrameDecoder:
+    """
+    Assemble LCD frames from main board data. `on_frame` is called with
+    (frame bytearray, time of first stripe, time of last stripe, bit flags
+    of stripes updated) once the bottom stripe arrives, or when a stripe
+    arrives that was already updated in the frame being assembled.
+    The frame bytearray is reused, copy it to keep it.
+    """
+    def __init__(self, on_frame):
+        self.on_frame = on_frame
+        self.frame = bytearray(STRIPE_WIDTH * STRIPE_COUNT)
+        self.stripes_updated = 0
+        self.frame_start = None
+        self.frame_end = None
+
+        self.command = None
+        self.stripe = None
+        self.bulk = bytearray()
+        self.bulk_remaining = 0
+
+    def main_board_data(self, new_bytes, now):
+        """Process bytes sent by main board, received at time `now`"""
+        for new_byte in new_bytes:
+            if self.bulk_remaining > 0:
+                self.bulk.append(new_byte)
+                self.bulk_remaining -= 1
+                if self.bulk_remaining == 0:
+                    self.bulk_complete(now)
+            elif self.command is None:
+                # Zero is not a valid command, ignore spurious data.
+                if new_byte != 0:
+                    self.command = new_byte
+            else:
+                command = self.command
+                self.command = None
+                if command == 0x04 and new_byte in STRIPE_IDS:
+                    self.stripe = STRIPE_IDS.index(new_byte)
+                elif command == 0x06:
+                    self.bulk_remaining = new_byte
+                    self.bulk.clear()
+
+    def bulk_complete(self, now):
+        if self.stripe is None or len(self.bulk) != STRIPE_WIDTH:
+            return
+        stripe_bit = 1 << self.stripe
+        if self.stripes_updated & stripe_bit:
+            # Stripe sent again before the bottom stripe, start a new frame
+            self.flush()
+        if self.frame_start is None:
+            self.frame_start = now
+        start = self.stripe * STRIPE_WIDTH
+        self.frame[start:start + STRIPE_WIDTH] = self.bulk
+        self.stripes_updated |= stripe_bit
+        self.frame_end = now
+        self.stripe = None
+        if stripe_bit == 1 << (STRIPE_COUNT - 1):
+            self.flush()
+
+    def flush(self):
+        """Emit frame assembled so far, if any stripes were updated"""
+        if self.stripes_updated:
+            self.on_frame(self.frame, self.frame_start, self.frame_end, self.stripes_updated)
+        self.stripes_updated = 0
+        self.frame_start = None
+
+class FrameWriter:
+    """`LcdFrameDecoder` callback writing each frame to an image file and index"""
+    def __init__(self, directory, image_format, index):
+        self.directory = directory
+        self.image_format = image_format
+        self.encode = png_image if image_format == "png" else pbm_image
+        self.index = index
+        self.count = 0
+
+    def __call__(self, frame, start, end, stripes):
+        name = "frame{0:06d}.{1}".format(self.count, self.image_format)
+        with open(os.path.join(self.directory, name), "wb") as image_file:
+            image_file.write(self.encode(frame))
+        # Stripes updated listed top to bottom, 1 if updated
+        updated = "".join("1" if stripes & (1 << stripe) else "0" for stripe in range(STRIPE_COUNT))
+        self.index.writerow((self.count, "{0:.7f}".format(start), "{0:.7f}".format(end), updated, name))
+        self.count += 1
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("file", help="Saleae async serial CSV export or binary capture")
+    parser.add_argument("--output", default="frames", help="Output directory (default: %(default)s)")
+    parser.add_argument("--format", choices=("png", "pbm"), default="png", help="Image format (default: %(default)s)")
+    parser.add_argument("--main-board", default=DEFAULT_MAIN_BOARD,
+        help="Analyzer name of main board to control panel data in CSV (default: %(default)s)")
+    parser.add_argument("--start", type=float, help="Capture time in seconds to start reconstructing")
+    parser.add_argument("--end", type=float, help="Capture time in seconds to stop reconstructing")
+    args = parser.parse_args()
+
+    os.makedirs(args.output, exist_ok=True)
+    with open(os.path.join(args.output, "index.csv"), "w", newline="") as index_file:
+        index = csv.writer(index_file)
+        index.writerow(("frame", "start_time", "end_time", "stripes", "file"))
+        writer = FrameWriter(args.output, args.format, index)
+
+        decoder = LcdFrameDecoder(writer)
+        for now, is_main_board, value in read_capture(args.file, args.main_board, args.start, args.end):
+            if is_main_board:
+                decoder.main_board_data((value,), now)
+        decoder.flush()
+    print(writer.count, "frames written to", args.output)
+
+if __name__ == "__main__":
+    main()
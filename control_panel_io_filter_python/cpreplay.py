@@ -0,0 +1,63 @@
+"""
+Replay logic analyzer captures through cpdecoder, without hardware.
+
+Reads CSV exported from Saleae Logic async serial analyzers, or binary
+capture files converted from them by cpcapture. See cpcapture for formats.
+
+Files are streamed a byte at a time, so memory use does not grow with file
+size. Capture timestamps, not the wall clock, decide when a partial command
+sequence has timed out. --start and --end decode only part of a capture;
+binary captures jump straight to the start time.
+"""
+
+import argparse
+import sys
+
+from cpcapture import read_capture, DEFAULT_MAIN_BOARD
+from cpdecoder import CommandFilter, MAIN_BOARD_TIMEOUT
+
+def replay(records, timestamps=False):
+    """
+    Decode (time, is_main_board, byte value) records from `read_capture()`,
+    printing decoded lines, optionally prefixed by capture time. Returns
+    number of bytes replayed.
+    """
+    now = 0.0
+    if timestamps:
+        command_filter = CommandFilter(output=lambda *line: print("{0:12.6f}".format(now), *line))
+    else:
+        command_filter = CommandFilter()
+
+    count = 0
+    for now, is_main_board, value in records:
+        command_filter.check_timeout(now)
+        if is_main_board:
+            command_filter.main_board_data((value,), now)
+        else:
+            command_filter.control_panel_data((value,))
+        count += 1
+
+    # Capture ended, report anything left hanging
+    now += MAIN_BOARD_TIMEOUT
+    command_filter.check_timeout(now)
+    return count
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("files", nargs="+", help="Saleae async serial CSV exports or binary captures")
+    parser.add_argument("--main-board", default=DEFAULT_MAIN_BOARD,
+        help="Analyzer name of main board to control panel data in CSV (default: %(default)s)")
+    parser.add_argument("--timestamps", action="store_true", help="Prefix each line with capture time")
+    parser.add_argument("--start", type=float, help="Capture time in seconds to start decoding")
+    parser.add_argument("--end", type=float, help="Capture time in seconds to stop decoding")
+    args = parser.parse_args()
+
+    for file_name in args.files:
+        if len(args.files) > 1:
+            print("==", file_name)
+        records = read_capture(file_name, args.main_board, args.start, args.end)
+        count = replay(records, args.timestamps)
+        print(file_name, count, "bytes", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
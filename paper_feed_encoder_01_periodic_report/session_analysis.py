@@ -0,0 +1,173 @@
+"""
+Summarize paper feed encoder session logs with NumPy, in parallel.
+
+Logs are recorded by paper_feed_encoder_01_periodic_report.ino. Each log has header "milliseconds,paper,gear,position", one row every 10ms.
+A session is loaded into NumPy arrays and every metric is computed over the
+whole array at once:
+* Velocity and acceleration of paper feed shaft
+* Movement segments: from shaft starting to turn until it has been still
+  for at least --stop-ms
+* Times of paper and gear sensor changes
+* Travel in shaft rotations, at 8640 encoder counts per rotation
+  (see "8640 per rotation.txt"). The logs have no once-per-rotation
+  reference, so that figure is applied as given, not measured here.
+
+Sessions are spread across a pool of processes, one per CPU core by
+default, and summarized in one table.
+
+    python3 session_analysis.py data/*.csv
+    python3 session_analysis.py --csv summary.csv data/*.csv
+
+Requires NumPy: pip install numpy
+"""
+
+import argparse
+import concurrent.futures
+import csv
+import os
+import sys
+import warnings
+
+import numpy as np
+
+COUNTS_PER_ROTATION = 8640
+
+# Shaft standing still at least this long ends a movement segment
+STOP_MILLISECONDS = 20
+
+# Summary table columns: (name, format)
+COLUMNS = (
+    ("session", "{0}"),
+    ("samples", "{0}"),
+    ("duration_s", "{0:.2f}"),
+    ("interval_ms", "{0:.2f}"),
+    ("segments", "{0}"),
+    ("moving_s", "{0:.2f}"),
+    ("longest_rot", "{0:.3f}"),
+    ("travel_rot", "{0:.3f}"),
+    ("net_rot", "{0:.3f}"),
+    ("max_rpm", "{0:.1f}"),
+    ("max_accel_rpm_s", "{0:.0f}"),
+    ("paper_edges", "{0}"),
+    ("first_paper_s", "{0}"),
+    ("gear_edges", "{0}"),
+    ("first_gear_s", "{0}"),
+)
+
+def load_session(path):
+    """
+    Returns (milliseconds, paper, gear, position) arrays of a session log,
+    or None if the log has no samples. Arduino millis() wraps around every
+    2**32, that is undone so time keeps increasing across wraps in long logs.
+    """
+    with warnings.catch_warnings():
+        # Empty logs are reported by caller
+        warnings.simplefilter("ignore", UserWarning)
+        data = np.loadtxt(path, delimiter=",", skiprows=1, dtype=np.int64, ndmin=2)
+    if len(data) == 0:
+        return None
+    milliseconds = data[:, 0]
+    wraps = np.cumsum(np.diff(milliseconds, prepend=milliseconds[0]) < -(1 << 31))
+    return milliseconds + (wraps << 32), data[:, 1], data[:, 2], data[:, 3]
+
+def movement_segments(milliseconds, position, stop_ms=STOP_MILLISECONDS):
+    """
+    Returns (start index, end index) arrays of movement segments. A segment
+    covers samples from just before the shaft moved until it stopped, with
+    pauses shorter than `stop_ms` merged into the surrounding segment.
+    """
+    moving = np.diff(position) != 0
+    edges = np.diff(moving.astype(np.int8), prepend=0, append=0)
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    if len(starts) == 0:
+        return starts, ends
+    # Merge segments separated by short pauses
+    long_pause = (milliseconds[starts[1:]] - milliseconds[ends[:-1]]) >= stop_ms
+    return starts[np.concatenate(([True], long_pause))], ends[np.concatenate((long_pause, [True]))]
+
+def sensor_edges(milliseconds, sensor):
+    """Returns times in milliseconds where sensor reading changed"""
+    return milliseconds[np.flatnonzero(np.diff(sensor)) + 1]
+
+def analyze_session(path, stop_ms=STOP_MILLISECONDS):
+    """Returns dictionary of metrics for one session log, None if it has no samples"""
+    session = load_session(path)
+    if session is None:
+        return None
+    milliseconds, paper, gear, position = session
+    interval = np.diff(milliseconds)
+
+    # Velocity in counts per millisecond between samples, acceleration
+    # between midpoints of those intervals. Samples logged in the same
+    # millisecond have no measurable velocity between them.
+    timed = interval > 0
+    velocity = np.diff(position)[timed] / interval[timed]
+    midpoints = milliseconds[:-1][timed] + interval[timed] / 2
+    acceleration = np.diff(velocity) / np.diff(midpoints) if len(velocity) > 1 else np.zeros(0)
+
+    # Counts per millisecond to rotations per minute
+    rpm = 60000 / COUNTS_PER_ROTATION
+
+    starts, ends = movement_segments(milliseconds, position, stop_ms)
+    segment_travel = np.abs(position[ends] - position[starts])
+    paper_edges = sensor_edges(milliseconds, paper)
+    gear_edges = sensor_edges(milliseconds, gear)
+
+    def first_edge(edges):
+        return "{0:.2f}".format((edges[0] - milliseconds[0]) / 1000) if len(edges) else "-"
+
+    return dict(
+        session=os.path.basename(path),
+        samples=len(milliseconds),
+        duration_s=(milliseconds[-1] - milliseconds[0]) / 1000,
+        interval_ms=float(np.mean(interval)) if len(interval) else 0.0,
+        segments=len(starts),
+        moving_s=float(np.sum(milliseconds[ends] - milliseconds[starts])) / 1000,
+        longest_rot=float(segment_travel.max(initial=0)) / COUNTS_PER_ROTATION,
+        travel_rot=float(np.sum(np.abs(np.diff(position)))) / COUNTS_PER_ROTATION,
+        net_rot=float(position[-1] - position[0]) / COUNTS_PER_ROTATION,
+        max_rpm=float(np.abs(velocity).max(initial=0)) * rpm,
+        max_accel_rpm_s=float(np.abs(acceleration).max(initial=0)) * rpm * 1000,
+        paper_edges=len(paper_edges),
+        first_paper_s=first_edge(paper_edges),
+        gear_edges=len(gear_edges),
+        first_gear_s=first_edge(gear_edges),
+    )
+
+def format_table(results):
+    """Summary table as aligned text"""
+    rows = [[name for name, _ in COLUMNS]]
+    for result in results:
+        rows.append([column_format.format(result[name]) for name, column_format in COLUMNS])
+    widths = [max(len(row[column]) for row in rows) for column in range(len(COLUMNS))]
+    return "\n".join(
+        "  ".join(value.ljust(width) if column == 0 else value.rjust(width)
+            for column, (value, width) in enumerate(zip(row, widths)))
+        for row in rows)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("files", nargs="+", help="Session log CSV files")
+    parser.add_argument("--jobs", type=int, default=None, help="Worker processes (default: one per CPU)")
+    parser.add_argument("--stop-ms", type=float, default=STOP_MILLISECONDS,
+        help="Milliseconds standing still that end a movement segment (default: %(default)s)")
+    parser.add_argument("--csv", help="Also write summary to this CSV file")
+    args = parser.parse_args()
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=args.jobs) as pool:
+        results = list(pool.map(analyze_session, args.files, [args.stop_ms] * len(args.files)))
+    for path, result in zip(args.files, results):
+        if result is None:
+            print("Skipping {0}: no samples".format(path), file=sys.stderr)
+    results = [result for result in results if result is not None]
+
+    print(format_table(results))
+    if args.csv:
+        with open(args.csv, "w", newline="") as csv_file:
+            writer = csv.DictWriter(csv_file, fieldnames=[name for name, _ in COLUMNS])
+            writer.writeheader()
+            writer.writerows(results)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,415 @@
+"""
+Precompute multi-resolution plot tiles of paper feed encoder logs.
+
+Long logs have far more samples than a chart has pixels. This builds a
+pyramid of downsampled levels once, caches it on disk next to the log,
+and serves any time range at a level that fits a requested number of
+points.
+
+Reads either:
+* Periodic reports from paper_feed_encoder_01_periodic_report, with header
+  "milliseconds,paper,gear,position". Has paper and gear sensor channels.
+* Position logs such as paper_feed_encoder_02_motion_decode/
+  single-entry-test-output/*.csv, with header "timestamp,position,count".
+  Position only.
+
+Times are kept in the unit of the log. Each level divides the log into
+buckets of equal time, FACTOR times wider than the level below. The
+finest level has buckets about as wide as the mean sample interval, the
+coarsest fits in TOP_BUCKETS buckets. Every bucket keeps:
+* Sample count, first and last position
+* Minimum and maximum position and the time each was reached, so plotted
+  points are real samples in time order
+* With --method lttb, one point chosen by Largest Triangle Three Buckets
+* Minimum and maximum of each sensor, showing pulses shorter than a bucket
+
+Levels are stored densely, one array element per bucket, so buckets of a
+time range are found by arithmetic instead of searching. Sensor edges are
+never downsampled: every edge is kept exactly, with an index per level
+from bucket to first edge at or after it.
+
+Cache is a directory named after the log with ".tiles" appended. It is
+rebuilt when the log's size or modification time changes.
+
+    python3 session_tiles.py data/session04.2.print.csv
+    python3 session_tiles.py --start 20000 --end 40000 --points 400 --csv out.csv data/session04.2.print.csv
+
+Requires NumPy: pip install numpy
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+
+import numpy as np
+
+# Cache format version, bump to invalidate caches written by older code
+VERSION = 1
+
+# Each level's buckets are this many times wider than the level below
+FACTOR = 4
+
+# Levels are added until the coarsest covers the log in this many buckets
+TOP_BUCKETS = 64
+
+# Points fetched per time range when not specified
+DEFAULT_POINTS = 2000
+
+METHODS = ("minmax", "lttb")
+
+# Edge of a sensor channel: time, channel number, value after the edge
+EDGE_DTYPE = np.dtype([("time", np.int64), ("channel", np.uint8), ("value", np.uint8)])
+
+def load_log(path):
+    """
+    Returns (times, positions, sensors) arrays of either log format.
+    `sensors` is a dictionary of channel name to array, empty for position
+    logs. Repeated header lines are skipped, and times that wrapped
+    around 32 bits are unwrapped.
+    """
+    with open(path) as log_file:
+        header = log_file.readline().strip().split(",")
+        lines = [line for line in log_file if line[:1].isdigit() or line[:1] == "-"]
+    data = np.loadtxt(lines, delimiter=",", dtype=np.int64, ndmin=2)
+    if len(data) == 0:
+        raise ValueError("{0} has no samples".format(path))
+
+    if header[:1] == ["milliseconds"]:
+        times, positions = data[:, 0], data[:, 3]
+        sensors = {"paper": data[:, 1], "gear": data[:, 2]}
+    else:
+        times, positions = data[:, 0], data[:, 1]
+        sensors = {}
+
+    # Arduino millis() and micros() wrap around every 2**32
+    wraps = np.cumsum(np.diff(times, prepend=times[0]) < -(1 << 31))
+    return times + (wraps << 32), positions, sensors
+
+def find_edges(times, sensors):
+    """Returns EDGE_DTYPE array of every sensor change, in time order"""
+    parts = []
+    for channel, values in enumerate(sensors.values()):
+        changed = np.flatnonzero(np.diff(values)) + 1
+        edges = np.zeros(len(changed), EDGE_DTYPE)
+        edges["time"] = times[changed]
+        edges["channel"] = channel
+        edges["value"] = values[changed]
+        parts.append(edges)
+    edges = np.concatenate(parts) if parts else np.zeros(0, EDGE_DTYPE)
+    return edges[np.argsort(edges["time"], kind="stable")]
+
+def bucket_dtype(sensor_names, method):
+    fields = [
+        ("count", np.uint32),
+        ("first", np.int64), ("last", np.int64),
+        ("min_time", np.int64), ("min", np.int64),
+        ("max_time", np.int64), ("max", np.int64),
+    ]
+    if method == "lttb":
+        fields += [("lttb_time", np.int64), ("lttb", np.int64)]
+    for name in sensor_names:
+        fields += [(name + "_min", np.uint8), (name + "_max", np.uint8)]
+    return np.dtype(fields)
+
+def group_starts(groups):
+    """Index where each run of equal values starts in sorted `groups`"""
+    return np.concatenate(([0], np.flatnonzero(np.diff(groups)) + 1))
+
+def group_extremes(groups, times, values):
+    """
+    Returns indices of (minimum, maximum) of `values` within each run of
+    equal `groups`. Ties go to the earliest time for the minimum and the
+    latest time for the maximum.
+    """
+    starts = group_starts(groups)
+    ends = np.append(starts[1:], len(groups))
+    # Runs are already in order, sorting by value within each keeps them
+    # where they were.
+    order = np.lexsort((times, values, groups))
+    return order[starts], order[ends - 1]
+
+def lttb(bucket_numbers, times, values):
+    """
+    Largest Triangle Three Buckets: from each run of equal `bucket_numbers`
+    pick the sample forming the largest triangle with the sample picked
+    from the bucket before and the mean of the bucket after. Returns
+    indices of picked samples, one per bucket.
+    """
+    starts = group_starts(bucket_numbers)
+    ends = np.append(starts[1:], len(bucket_numbers))
+    counts = ends - starts
+    mean_times = np.add.reduceat(times.astype(np.float64), starts) / counts
+    mean_values = np.add.reduceat(values.astype(np.float64), starts) / counts
+
+    picked = np.empty(len(starts), np.int64)
+    picked[0] = starts[0]
+    for bucket in range(1, len(starts)):
+        start, end = starts[bucket], ends[bucket]
+        if bucket + 1 == len(starts) or end - start == 1:
+            # Last bucket keeps its first sample, so does a single sample
+            picked[bucket] = start
+            continue
+        previous = picked[bucket - 1]
+        area = np.abs(
+            (times[previous] - mean_times[bucket + 1]) * (values[start:end] - values[previous]) -
+            (times[previous] - times[start:end]) * (mean_values[bucket + 1] - values[previous]))
+        picked[bucket] = start + int(np.argmax(area))
+    return picked
+
+def build_levels(times, positions, sensors, method="minmax"):
+    """
+    Returns (base width, list of level arrays, edges, list of edge index
+    arrays). Level k has buckets base width * FACTOR**k wide, starting at
+    the first sample.
+    """
+    start = times[0]
+    duration = int(times[-1] - start) + 1
+    base_width = max(1, (duration + len(times) // 2) // len(times))
+    dtype = bucket_dtype(sensors, method)
+    edges = find_edges(times, sensors)
+
+    levels = []
+    edge_indexes = []
+    width = base_width
+    # Samples reduced so far: one per non-empty bucket of the previous
+    # level, starting with the raw log.
+    count = np.ones(len(times), np.uint32)
+    first = last = positions
+    min_time = max_time = times
+    minimum = maximum = positions
+    sensor_min = dict(sensors)
+    sensor_max = dict(sensors)
+    while True:
+        bucket_count = -(-duration // width)
+        numbers = (min_time - start) // width
+        starts = group_starts(numbers)
+        ends = np.append(starts[1:], len(numbers))
+        occupied = numbers[starts]
+        low, _ = group_extremes(numbers, min_time, minimum)
+        _, high = group_extremes(numbers, max_time, maximum)
+
+        buckets = np.zeros(bucket_count, dtype)
+        filled = buckets[occupied]
+        filled["count"] = np.add.reduceat(count, starts)
+        filled["first"] = first[starts]
+        filled["last"] = last[ends - 1]
+        filled["min_time"] = min_time[low]
+        filled["min"] = minimum[low]
+        filled["max_time"] = max_time[high]
+        filled["max"] = maximum[high]
+        if method == "lttb":
+            picked = lttb((times - start) // width, times, positions)
+            filled["lttb_time"] = times[picked]
+            filled["lttb"] = positions[picked]
+        for name in sensors:
+            filled[name + "_min"] = np.minimum.reduceat(sensor_min[name], starts)
+            filled[name + "_max"] = np.maximum.reduceat(sensor_max[name], starts)
+        buckets[occupied] = filled
+        levels.append(buckets)
+        edge_indexes.append(np.searchsorted(edges["time"], start + np.arange(bucket_count + 1) * width))
+
+        if bucket_count <= TOP_BUCKETS:
+            break
+        # Next level is reduced from the non-empty buckets of this one
+        count = filled["count"]
+        first, last = filled["first"], filled["last"]
+        min_time, minimum = filled["min_time"], filled["min"]
+        max_time, maximum = filled["max_time"], filled["max"]
+        sensor_min = {name: filled[name + "_min"] for name in sensors}
+        sensor_max = {name: filled[name + "_max"] for name in sensors}
+        width *= FACTOR
+    return base_width, levels, edges, edge_indexes
+
+def cache_directory(path, cache_dir=None):
+    name = os.path.basename(path) + ".tiles"
+    return os.path.join(cache_dir if cache_dir else os.path.dirname(os.path.abspath(path)), name)
+
+def source_stamp(path):
+    """Identifies the version of a log, for cache invalidation"""
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+class SessionTiles:
+    """
+    Cached tiles of one log, memory-mapped. Open with `open_tiles()`.
+    Times are in the unit of the log.
+    """
+    def __init__(self, directory):
+        with open(os.path.join(directory, "meta.json")) as meta_file:
+            self.meta = json.load(meta_file)
+        self.start = self.meta["start"]
+        self.end = self.meta["end"]
+        self.base_width = self.meta["base_width"]
+        self.sensors = self.meta["sensors"]
+        self.method = self.meta["method"]
+        self.samples = np.load(os.path.join(directory, "samples.npy"), mmap_mode="r")
+        self.edges = np.load(os.path.join(directory, "edges.npy"), mmap_mode="r")
+        self.levels = []
+        self.edge_indexes = []
+        for level in range(self.meta["levels"]):
+            self.levels.append(np.load(os.path.join(directory, "level{0}.npy".format(level)), mmap_mode="r"))
+            self.edge_indexes.append(np.load(os.path.join(directory, "level{0}.edges.npy".format(level)), mmap_mode="r"))
+
+    def width(self, level):
+        """Bucket width of `level`"""
+        return self.base_width * FACTOR ** level
+
+    def level_for(self, start, end, points=DEFAULT_POINTS):
+        """
+        Finest level covering start to end in no more than `points`
+        buckets, or None if raw samples are no more than that.
+        """
+        span = max(1, end - start)
+        if span // self.base_width <= points:
+            return None
+        for level in range(len(self.levels)):
+            if span // self.width(level) <= points:
+                return level
+        return len(self.levels) - 1
+
+    def bucket_range(self, level, start, end):
+        """Numbers of first and past-the-last bucket of `level` between start and end"""
+        width = self.width(level)
+        count = len(self.levels[level])
+        first = min(count, max(0, (start - self.start) // width))
+        last = min(count, max(0, (end - self.start) // width + 1))
+        return first, last
+
+    def buckets(self, level, start, end):
+        """Bucket array slice of `level` between start and end, empty buckets included"""
+        first, last = self.bucket_range(level, start, end)
+        return self.levels[level][first:last]
+
+    def sensor_edges(self, start, end):
+        """Every sensor edge between start and end, exactly as logged"""
+        first = np.searchsorted(self.edges["time"], start)
+        last = np.searchsorted(self.edges["time"], end, side="right")
+        return self.edges[first:last]
+
+    def level_edges(self, level, start, end):
+        """Sensor edges within the buckets of `level` between start and end"""
+        first, last = self.bucket_range(level, start, end)
+        index = self.edge_indexes[level]
+        return self.edges[index[first]:index[last]]
+
+    def points(self, start=None, end=None, points=DEFAULT_POINTS):
+        """
+        Returns (level, times, positions) of plot points between start and
+        end, at most about `points` of them, or up to twice that for
+        min/max buckets. Level is None for raw samples.
+        """
+        start = self.start if start is None else start
+        end = self.end if end is None else end
+        level = self.level_for(start, end, points)
+        if level is None:
+            first = np.searchsorted(self.samples["time"], start)
+            last = np.searchsorted(self.samples["time"], end, side="right")
+            samples = self.samples[first:last]
+            return None, np.asarray(samples["time"]), np.asarray(samples["position"])
+
+        buckets = self.buckets(level, start, end)
+        buckets = buckets[buckets["count"] > 0]
+        if self.method == "lttb":
+            return level, np.asarray(buckets["lttb_time"]), np.asarray(buckets["lttb"])
+        # Minimum and maximum of each bucket in the order they happened,
+        # dropping the second when both are the same sample
+        min_first = buckets["min_time"] <= buckets["max_time"]
+        times = np.where(min_first, buckets["min_time"], buckets["max_time"])
+        positions = np.where(min_first, buckets["min"], buckets["max"])
+        later_times = np.where(min_first, buckets["max_time"], buckets["min_time"])
+        later_positions = np.where(min_first, buckets["max"], buckets["min"])
+        times = np.stack((times, later_times), axis=1).ravel()
+        positions = np.stack((positions, later_positions), axis=1).ravel()
+        keep = np.ones(len(times), bool)
+        keep[1::2] = (buckets["min_time"] != buckets["max_time"]) | (buckets["min"] != buckets["max"])
+        return level, times[keep], positions[keep]
+
+def write_tiles(path, directory, method="minmax"):
+    """Build tiles of log at `path` into cache `directory`"""
+    stamp = source_stamp(path)
+    times, positions, sensors = load_log(path)
+    base_width, levels, edges, edge_indexes = build_levels(times, positions, sensors, method)
+
+    os.makedirs(directory, exist_ok=True)
+    # Stale metadata first, so a build interrupted part way is not trusted
+    meta_path = os.path.join(directory, "meta.json")
+    if os.path.exists(meta_path):
+        os.remove(meta_path)
+
+    samples = np.zeros(len(times), [("time", np.int64), ("position", np.int64)])
+    samples["time"] = times
+    samples["position"] = positions
+    np.save(os.path.join(directory, "samples.npy"), samples)
+    np.save(os.path.join(directory, "edges.npy"), edges)
+    for level, (buckets, edge_index) in enumerate(zip(levels, edge_indexes)):
+        np.save(os.path.join(directory, "level{0}.npy".format(level)), buckets)
+        np.save(os.path.join(directory, "level{0}.edges.npy".format(level)), edge_index)
+
+    meta = dict(stamp, version=VERSION, source=os.path.basename(path), method=method,
+        start=int(times[0]), end=int(times[-1]), samples=len(times), base_width=base_width,
+        factor=FACTOR, levels=len(levels), sensors=list(sensors))
+    with open(meta_path, "w") as meta_file:
+        json.dump(meta, meta_file, indent=1)
+
+def cache_valid(path, directory, method):
+    try:
+        with open(os.path.join(directory, "meta.json")) as meta_file:
+            meta = json.load(meta_file)
+    except (OSError, ValueError):
+        return False
+    stamp = source_stamp(path)
+    return (meta.get("version") == VERSION and meta.get("method") == method and
+        meta.get("factor") == FACTOR and
+        meta.get("size") == stamp["size"] and meta.get("mtime_ns") == stamp["mtime_ns"])
+
+def open_tiles(path, cache_dir=None, method="minmax", rebuild=False):
+    """
+    Returns SessionTiles of log at `path`, building them first if the
+    cache is missing, stale or for another method.
+    """
+    directory = cache_directory(path, cache_dir)
+    if rebuild or not cache_valid(path, directory, method):
+        write_tiles(path, directory, method)
+    return SessionTiles(directory)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("files", nargs="+", help="Periodic report or position log CSV files")
+    parser.add_argument("--method", choices=METHODS, default="minmax",
+        help="Downsampling within each bucket (default: %(default)s)")
+    parser.add_argument("--cache-dir", help="Directory for tile caches (default: next to each log)")
+    parser.add_argument("--rebuild", action="store_true", help="Rebuild tiles even if cache is current")
+    parser.add_argument("--start", type=int, help="Export from this time, in unit of the log")
+    parser.add_argument("--end", type=int, help="Export up to this time, in unit of the log")
+    parser.add_argument("--points", type=int, default=DEFAULT_POINTS,
+        help="Approximate number of points to export (default: %(default)s)")
+    parser.add_argument("--csv", help="Export points and sensor edges of first file to this CSV file")
+    args = parser.parse_args()
+
+    for file_name in args.files:
+        tiles = open_tiles(file_name, args.cache_dir, args.method, args.rebuild)
+        widths = ", ".join(str(tiles.width(level)) for level in range(len(tiles.levels)))
+        print("{0}: {1} samples, {2} edges, bucket widths {3}".format(
+            file_name, tiles.meta["samples"], len(tiles.edges), widths), file=sys.stderr)
+
+    if args.csv:
+        tiles = open_tiles(args.files[0], args.cache_dir, args.method)
+        start = tiles.start if args.start is None else args.start
+        end = tiles.end if args.end is None else args.end
+        level, times, positions = tiles.points(start, end, args.points)
+        # Position points and sensor edges merged in time order
+        rows = [(time, "position", position) for time, position in zip(times.tolist(), positions.tolist())]
+        rows += [(int(edge["time"]), tiles.sensors[edge["channel"]], int(edge["value"]))
+            for edge in tiles.sensor_edges(start, end)]
+        rows.sort(key=lambda row: row[0])
+        with open(args.csv, "w", newline="") as csv_file:
+            writer = csv.writer(csv_file)
+            writer.writerow(("time", "channel", "value"))
+            writer.writerows(rows)
+        print("{0}: {1} rows at level {2}".format(args.csv, len(rows), "raw" if level is None else level),
+            file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+"""
+Python port of the motion decoder in paper_feed_encoder_02_motion_decode.ino
+
+Applies the same algorithm as the Arduino sketch to logged encoder data,
+so motion can be re-segmented with different thresholds without flashing
+hardware. Output is the same CSV the sketch prints to serial:
+
+    timestamp,count,min_us_enc   (start of movement, encoder counts moved,
+                                  smallest microseconds per encoder count)
+    timestamp,paper,0            (sensor changes, when input has sensors)
+
+Reads either:
+* Periodic reports from paper_feed_encoder_01_periodic_report, with header
+  "milliseconds,paper,gear,position". One encoder poll every 10ms.
+* Position logs such as single-entry-test-output/*.us.csv, with header
+  "timestamp,position,count": one row per position change, where count is
+  the number of polls that position was held. No sensor data.
+
+Everything is streamed through generators a row at a time, so input of any
+length can be decoded in constant memory.
+"""
+
+import argparse
+import csv
+import sys
+
+# Same defaults as the Arduino sketch
+TIME_PER_POSITION_THRESHOLD = 10000 # Microseconds without movement treated as stopped
+MINIMUM_MOVEMENT = 10               # Encoder counts of movement worth reporting
+
+class EncoderPosition:
+    """Record-keeping structure for tracking activity across multiple encoder polls"""
+    def __init__(self, timestamp=0, position=0, count=0, time_per_position=0):
+        self.timestamp = timestamp
+        self.position = position
+        self.count = count
+        self.time_per_position = time_per_position
+
+    def copy(self):
+        return EncoderPosition(self.timestamp, self.position, self.count, self.time_per_position)
+
+def c_divide(numerator, denominator):
+    """Integer division truncating toward zero, like C"""
+    quotient = abs(numerator) // abs(denominator)
+    return quotient if (numerator < 0) == (denominator < 0) else -quotient
+
+def decode_motion(polls, threshold=TIME_PER_POSITION_THRESHOLD, minimum_movement=MINIMUM_MOVEMENT):
+    """
+    Generator yielding report rows from encoder polls.
+
+    :param polls: Iterable of (timestamp in microseconds, encoder position,
+        paper sensor, gear sensor) for each poll. Sensors are None if unknown.
+    :param threshold: Microseconds a position must be held to end a movement
+    :param minimum_movement: Movements of this many counts or fewer are not reported
+    :returns: Rows of (timestamp, count, min_us_enc) for movements and
+        (timestamp, "paper" or "gear", 0 or 1) for sensor changes
+    """
+    polls = iter(polls)
+    try:
+        timestamp, position, prev_paper, prev_gear = next(polls)
+    except StopIteration:
+        return
+
+    # Two entry history ring, to collapse bounces between two positions
+    history = [EncoderPosition(timestamp, position, 1), EncoderPosition()]
+    current = 0
+    previous = 0
+    prev_report = history[current].copy()
+    min_us_enc = threshold
+
+    for timestamp, position, paper, gear in polls:
+        entry = history[current]
+        if position == entry.position:
+            # Encoder position has not changed
+            entry.count += 1
+
+            if (prev_report.timestamp < entry.timestamp and
+                abs(prev_report.position - entry.position) > minimum_movement and
+                (timestamp - entry.timestamp) > threshold):
+                # Encoder position has held for longer than threshold,
+                # interpreting as end of movement.
+                yield prev_report.timestamp, entry.position - prev_report.position, min_us_enc
+
+                prev_report = entry.copy()
+                min_us_enc = threshold
+        elif previous != current and position == history[previous].position:
+            # Merely bounced back to previous position, collapse 'current'
+            # and 'previous' entries together and continue as if 'current'
+            # never happened.
+            history[previous].count += entry.count
+            current = previous
+        else:
+            # Microseconds per encoder count. Negative values reflect
+            # decrementing encoder count. It does not mean time reversal.
+            us_enc = c_divide(timestamp - entry.timestamp, position - entry.position)
+            entry.time_per_position = us_enc
+            if abs(us_enc) < abs(min_us_enc):
+                min_us_enc = us_enc
+
+            # Advance pointers
+            previous = current
+            current = 1 - current
+
+            history[current] = EncoderPosition(timestamp, position, 1)
+
+        if paper is not None and paper != prev_paper:
+            yield timestamp, "paper", paper
+        if gear is not None and gear != prev_gear:
+            yield timestamp, "gear", gear
+        prev_paper = paper
+        prev_gear = gear
+
+def unwrap_timestamps(rows, bits=32):
+    """
+    Arduino micros() and millis() wrap around every 2**32. Undo that so
+    time keeps increasing across wraps in long logs. Takes rows whose first
+    field is the raw counter value, before any conversion of units, and
+    yields them with that field replaced by the unwrapped integer.
+    """
+    modulus = 1 << bits
+    offset = 0
+    last = None
+    for row in rows:
+        timestamp = int(row[0])
+        if last is not None and timestamp + offset < last - modulus // 2:
+            offset += modulus
+        last = timestamp + offset
+        yield [last] + row[1:]
+
+def read_periodic_report(rows):
+    """Polls from "milliseconds,paper,gear,position" rows, in microseconds"""
+    rows = (row for row in rows if row and row[0].isdigit())
+    for row in unwrap_timestamps(rows):
+        yield row[0] * 1000, int(row[3]), int(row[1]), int(row[2])
+
+def read_position_log(rows, scale=1):
+    """
+    Polls from "timestamp,position,count" rows of position changes. Between
+    changes, a poll one time unit before the next change stands in for the
+    polls that held the position, so a hold longer than threshold is seen
+    before the move that ends it.
+    """
+    rows = (row for row in rows if row and row[0].lstrip("-").isdigit())
+    last = None
+    for row in unwrap_timestamps(rows):
+        timestamp = row[0] * scale
+        position = int(row[1])
+        if last is not None and int(last[2]) > 1 and timestamp - scale > last[0]:
+            yield timestamp - scale, last[1], None, None
+        yield timestamp, position, None, None
+        last = (timestamp, position, row[2])
+
+def read_polls(log_file, time_unit=None):
+    r"""
+    Polls from a log file of either format, detected from header line.
+    Timestamps are in microseconds, unwrapped across counter rollover:
+
+    >>> import io
+    >>> log = io.StringIO("milliseconds,paper,gear,position\n"
+    ...     "4294967286,1,1,0\n4294967296,1,1,0\n10,1,1,0\n")
+    >>> [poll[0] for poll in read_polls(log)]
+    [4294967286000, 4294967296000, 4294967306000]
+    >>> log = io.StringIO("timestamp,position,count\n"
+    ...     "4294967290,0,1\n4,5,1\n")
+    >>> [poll[0] for poll in read_polls(log, "ms")]
+    [4294967290000, 4294967300000]
+    """
+    rows = csv.reader(log_file)
+    header = next(rows, [])
+    if header[:1] == ["milliseconds"]:
+        return read_periodic_report(rows)
+    return read_position_log(rows, 1000 if time_unit == "ms" else 1)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("file", nargs="?", help="Encoder log CSV (default: standard input)")
+    parser.add_argument("--threshold", type=int, default=TIME_PER_POSITION_THRESHOLD,
+        help="Microseconds without movement treated as stopped (default: %(default)s)")
+    parser.add_argument("--minimum-movement", type=int, default=MINIMUM_MOVEMENT,
+        help="Encoder counts of movement worth reporting (default: %(default)s)")
+    parser.add_argument("--time-unit", choices=("us", "ms"), default="us",
+        help="Time unit of position log timestamps (default: %(default)s)")
+    parser.add_argument("--no-us-enc", action="store_true",
+        help="Leave out min_us_enc column, as in motion-decode-output")
+    args = parser.parse_args()
+
+    log_file = open(args.file, newline="") if args.file else sys.stdin
+    with log_file:
+        print("timestamp,count" if args.no_us_enc else "timestamp,count,min_us_enc")
+        for row in decode_motion(read_polls(log_file, args.time_unit), args.threshold, args.minimum_movement):
+            if args.no_us_enc and row[1] not in ("paper", "gear"):
+                row = row[:2]
+            print(",".join(str(value) for value in row))
+
+if __name__ == "__main__":
+    main()